@@ -1,22 +1,29 @@
 ﻿from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Request
-from typing import List
-from pydantic import BaseModel
-from datetime import timedelta
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
-import uuid
+from typing import List, Optional
+from pydantic import BaseModel, Field
+from datetime import datetime, timedelta
 from pathlib import Path
 
 from models import (
     Product, ProductCreate, Review, ReviewCreate, Category,
     HeroSlide, HeroSlideCreate, SiteSettings, Catalog
 )
-from auth import authenticate_user, create_access_token, require_admin, ACCESS_TOKEN_EXPIRE_MINUTES
-
-mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-db_name = os.environ.get('DB_NAME', 'wolfterm_db')
-client = AsyncIOMotorClient(mongo_url, serverSelectionTimeoutMS=1000, connectTimeoutMS=1000)
-db = client[db_name]
+from auth import EDITOR_ROLES, create_access_token, require_admin, require_editor, ACCESS_TOKEN_EXPIRE_MINUTES
+from admin_users import authenticate, create_user, delete_user, list_users, update_user
+from cache import catalog_cache
+from search import search_index
+from database import db, pool_stats
+from indexes import index_status
+from write_behind import write_queue
+from bulk_import import IMPORT_FORMATS, IMPORT_MAX_BYTES, ImportJob, detect_format, import_jobs, start_import
+from images import store_upload
+from fast_json import model_response
+from product_cards import rebuild_cards, upsert_card
+from review_stats import load_summary, rebuild_review_stats, review_deleted, review_updated
+from uploads import (
+    UPLOAD_RESUMABLE_THRESHOLD, append_chunk, cancel_session, create_session,
+    finish_session, get_session, run_io, spool, upload_file_chunks
+)
 
 router = APIRouter(prefix="/api/admin")
 
@@ -32,11 +39,33 @@ class LoginResponse(BaseModel):
     username: str
 
 
+ROLE_PATTERN = "^(" + "|".join(EDITOR_ROLES) + ")$"
+
+
+class AdminUser(BaseModel):
+    username: str
+    role: str
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+class AdminUserCreate(BaseModel):
+    username: str = Field(min_length=3, max_length=64, pattern=r"^[A-Za-z0-9_.@-]+$")
+    password: str = Field(min_length=8)
+    role: str = Field(default="editor", pattern=ROLE_PATTERN)
+
+
+class AdminUserUpdate(BaseModel):
+    password: Optional[str] = Field(default=None, min_length=8)
+    role: Optional[str] = Field(default=None, pattern=ROLE_PATTERN)
+
+
 class DashboardStats(BaseModel):
     total_products: int
     total_reviews: int
     total_categories: int
     total_hero_slides: int
+    average_rating: Optional[float] = None
     recent_products: List[Product] = []
     recent_reviews: List[Review] = []
 
@@ -44,12 +73,30 @@ class DashboardStats(BaseModel):
 class ImageUploadResponse(BaseModel):
     url: str
     filename: str
+    # srcset-ready variants for images; None for other files (e.g. PDFs)
+    manifest: Optional[dict] = None
+
+
+class UploadSessionCreate(BaseModel):
+    filename: str
+    size: int
+
+
+class UploadSession(BaseModel):
+    upload_id: str
+    filename: str
+    size: int
+    offset: int
+    chunk_size: int
 
 
 # Authentication
 @router.post("/login", response_model=LoginResponse)
 async def login(request: LoginRequest):
-    user = authenticate_user(request.username, request.password)
+    try:
+        user = await authenticate(db, request.username, request.password)
+    except Exception:
+        raise HTTPException(status_code=503, detail="Database unavailable")
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -70,9 +117,38 @@ async def login(request: LoginRequest):
     )
 
 
+# Admin users
+@router.get("/users", response_model=List[AdminUser])
+async def get_admin_users(current_user: dict = Depends(require_admin)):
+    try:
+        return await list_users(db)
+    except Exception:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+
+
+@router.post("/users", response_model=AdminUser, status_code=201)
+async def create_admin_user(body: AdminUserCreate, current_user: dict = Depends(require_admin)):
+    return await create_user(db, body.username, body.password, body.role)
+
+
+@router.put("/users/{username}", response_model=AdminUser)
+async def update_admin_user(username: str, body: AdminUserUpdate, current_user: dict = Depends(require_admin)):
+    if username == current_user["sub"] and body.role not in (None, "admin"):
+        raise HTTPException(status_code=400, detail="Cannot remove your own admin role")
+    return await update_user(db, username, body.password, body.role)
+
+
+@router.delete("/users/{username}")
+async def delete_admin_user(username: str, current_user: dict = Depends(require_admin)):
+    if username == current_user["sub"]:
+        raise HTTPException(status_code=400, detail="Cannot delete your own account")
+    await delete_user(db, username)
+    return {"message": "User deleted"}
+
+
 # Dashboard
 @router.get("/dashboard", response_model=DashboardStats)
-async def get_dashboard_stats(current_user: dict = Depends(require_admin)):
+async def get_dashboard_stats(current_user: dict = Depends(require_editor)):
     try:
         total_products = await db.products.count_documents({})
         total_reviews = await db.reviews.count_documents({})
@@ -84,24 +160,41 @@ async def get_dashboard_stats(current_user: dict = Depends(require_admin)):
 
         recent_reviews_cursor = db.reviews.find().sort("date", -1).limit(5)
         recent_reviews = await recent_reviews_cursor.to_list(length=5)
+        review_summary = await load_summary(db)
 
-        return DashboardStats(
+        return model_response(DashboardStats(
             total_products=total_products,
             total_reviews=total_reviews,
             total_categories=total_categories,
             total_hero_slides=total_hero_slides,
+            average_rating=review_summary.average,
             recent_products=[Product(**p) for p in recent_products],
             recent_reviews=[Review(**r) for r in recent_reviews]
-        )
+        ))
     except Exception:
-        return DashboardStats(
+        return model_response(DashboardStats(
             total_products=0,
             total_reviews=0,
             total_categories=0,
             total_hero_slides=0,
             recent_products=[],
             recent_reviews=[]
-        )
+        ))
+
+
+@router.get("/db-pool")
+async def get_db_pool_stats(current_user: dict = Depends(require_admin)):
+    return pool_stats()
+
+
+@router.get("/db-indexes")
+async def get_db_index_status(current_user: dict = Depends(require_admin)):
+    return index_status
+
+
+@router.get("/write-queue")
+async def get_write_queue_status(current_user: dict = Depends(require_admin)):
+    return write_queue.status()
 
 
 # Products Management
@@ -109,7 +202,7 @@ async def get_dashboard_stats(current_user: dict = Depends(require_admin)):
 async def update_product(
     product_id: str,
     product: ProductCreate,
-    current_user: dict = Depends(require_admin)
+    current_user: dict = Depends(require_editor)
 ):
     existing_product = await db.products.find_one({"id": product_id})
     if not existing_product:
@@ -119,7 +212,48 @@ async def update_product(
     await db.products.update_one({"id": product_id}, {"$set": update_data})
 
     updated_product = await db.products.find_one({"id": product_id})
-    return Product(**updated_product)
+    await upsert_card(db, updated_product)
+    catalog_cache.invalidate("products")
+    search_index.add(updated_product)
+    return model_response(Product(**updated_product))
+
+
+@router.post("/product-cards/rebuild")
+async def rebuild_product_cards(current_user: dict = Depends(require_admin)):
+    try:
+        count = await rebuild_cards(db)
+    except Exception:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    catalog_cache.invalidate("products")
+    return {"rebuilt": count}
+
+
+# Bulk import: runs in the background, poll the returned job for progress
+@router.post("/products/import", response_model=ImportJob, status_code=202)
+async def import_products(
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    current_user: dict = Depends(require_editor)
+):
+    fmt = format or detect_format(file.filename, file.content_type)
+    if fmt not in IMPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported import format; use one of: {', '.join(IMPORT_FORMATS)}"
+        )
+    # Read one byte past the cap to tell "exactly at the limit" from "over it"
+    data = await file.read(IMPORT_MAX_BYTES + 1)
+    if len(data) > IMPORT_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Import file exceeds {IMPORT_MAX_BYTES} bytes")
+    return start_import(db, data, fmt)
+
+
+@router.get("/products/import/{job_id}", response_model=ImportJob)
+async def get_import_job(job_id: str, current_user: dict = Depends(require_editor)):
+    job = import_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
 
 
 # Reviews Management
@@ -127,60 +261,75 @@ async def update_product(
 async def update_review(
     review_id: str,
     review: ReviewCreate,
-    current_user: dict = Depends(require_admin)
+    current_user: dict = Depends(require_editor)
 ):
-    existing_review = await db.reviews.find_one({"id": review_id})
+    update_data = review.dict(exclude_unset=True)
+    # Returns the document as it was before the update
+    existing_review = await db.reviews.find_one_and_update({"id": review_id}, {"$set": update_data})
     if not existing_review:
         raise HTTPException(status_code=404, detail="Review not found")
 
-    update_data = review.dict(exclude_unset=True)
-    await db.reviews.update_one({"id": review_id}, {"$set": update_data})
-
-    updated_review = await db.reviews.find_one({"id": review_id})
-    return Review(**updated_review)
+    updated_review = {**existing_review, **update_data}
+    await review_updated(db, existing_review, updated_review)
+    catalog_cache.invalidate("reviews")
+    return model_response(Review(**updated_review))
 
 
 @router.delete("/reviews/{review_id}")
 async def delete_review(
     review_id: str,
-    current_user: dict = Depends(require_admin)
+    current_user: dict = Depends(require_editor)
 ):
-    result = await db.reviews.delete_one({"id": review_id})
-    if result.deleted_count == 0:
+    deleted_review = await db.reviews.find_one_and_delete({"id": review_id})
+    if not deleted_review:
         raise HTTPException(status_code=404, detail="Review not found")
+    await review_deleted(db, deleted_review)
+    catalog_cache.invalidate("reviews")
     return {"message": "Review deleted successfully"}
 
 
+@router.post("/review-stats/rebuild")
+async def rebuild_review_summary(current_user: dict = Depends(require_admin)):
+    try:
+        count = await rebuild_review_stats(db)
+    except Exception:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    catalog_cache.invalidate("reviews")
+    return {"rebuilt": count}
+
+
 # Categories Management
 @router.post("/categories", response_model=Category)
 async def create_category(
     category: Category,
-    current_user: dict = Depends(require_admin)
+    current_user: dict = Depends(require_editor)
 ):
     await db.categories.insert_one(category.dict())
-    return category
+    catalog_cache.invalidate("categories")
+    return model_response(category)
 
 
 @router.put("/categories/{category_id}", response_model=Category)
 async def update_category(
     category_id: str,
     category: Category,
-    current_user: dict = Depends(require_admin)
+    current_user: dict = Depends(require_editor)
 ):
     existing_category = await db.categories.find_one({"id": category_id})
     if not existing_category:
         raise HTTPException(status_code=404, detail="Category not found")
 
     await db.categories.update_one({"id": category_id}, {"$set": category.dict()})
-    return category
+    catalog_cache.invalidate("categories")
+    return model_response(category)
 
 
 # Hero Slides Management
 @router.get("/hero-slides", response_model=List[HeroSlide])
-async def get_hero_slides(current_user: dict = Depends(require_admin)):
+async def get_hero_slides(current_user: dict = Depends(require_editor)):
     try:
-        slides = await db.hero_slides.find().sort("order", 1).to_list(length=100)
-        return [HeroSlide(**slide) for slide in slides]
+        slides = await db.hero_slides.find().sort("order", 1).to_list(length=None)
+        return model_response([HeroSlide(**slide) for slide in slides])
     except Exception:
         return []
 
@@ -188,37 +337,40 @@ async def get_hero_slides(current_user: dict = Depends(require_admin)):
 @router.post("/hero-slides", response_model=HeroSlide)
 async def create_hero_slide(
     slide: HeroSlideCreate,
-    current_user: dict = Depends(require_admin)
+    current_user: dict = Depends(require_editor)
 ):
     slide_dict = slide.dict()
     slide_obj = HeroSlide(**slide_dict)
     await db.hero_slides.insert_one(slide_obj.dict())
-    return slide_obj
+    catalog_cache.invalidate("hero_slides")
+    return model_response(slide_obj)
 
 
 @router.put("/hero-slides/{slide_id}", response_model=HeroSlide)
 async def update_hero_slide(
     slide_id: str,
     slide: HeroSlideCreate,
-    current_user: dict = Depends(require_admin)
+    current_user: dict = Depends(require_editor)
 ):
     existing_slide = await db.hero_slides.find_one({"id": slide_id})
     if not existing_slide:
         raise HTTPException(status_code=404, detail="Hero slide not found")
 
     await db.hero_slides.update_one({"id": slide_id}, {"$set": slide.dict()})
+    catalog_cache.invalidate("hero_slides")
     updated_slide = await db.hero_slides.find_one({"id": slide_id})
-    return HeroSlide(**updated_slide)
+    return model_response(HeroSlide(**updated_slide))
 
 
 @router.delete("/hero-slides/{slide_id}")
 async def delete_hero_slide(
     slide_id: str,
-    current_user: dict = Depends(require_admin)
+    current_user: dict = Depends(require_editor)
 ):
     result = await db.hero_slides.delete_one({"id": slide_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Hero slide not found")
+    catalog_cache.invalidate("hero_slides")
     return {"message": "Hero slide deleted successfully"}
 
 
@@ -242,6 +394,7 @@ async def get_settings(current_user: dict = Depends(require_admin)):
             # Ensure a stable id so future GET/PUT find the same record
             default_settings.id = "site_settings"
             await db.site_settings.insert_one(default_settings.dict())
+            catalog_cache.invalidate("site_settings")
             return default_settings
         return SiteSettings(**settings)
     except Exception:
@@ -277,6 +430,7 @@ async def update_settings(
             {"$set": settings.dict()},
             upsert=True
         )
+        catalog_cache.invalidate("site_settings")
         return settings
     except Exception:
         # DB unavailable: persist to seeds file as fallback so admin UI keeps working
@@ -289,45 +443,95 @@ async def update_settings(
             seeds_path = seeds_dir / "site_settings.json"
             payload = json.dumps(settings.dict(), default=pydantic_encoder, ensure_ascii=False, indent=2)
             seeds_path.write_text(payload, encoding="utf-8")
+            catalog_cache.invalidate("site_settings")
             return settings
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to persist settings: {e}")
 
 
-# Image Upload: save to backend/uploads and return served URL
+def _upload_response(request: Request, stored: dict) -> ImageUploadResponse:
+    base = str(request.base_url).rstrip("/")
+    manifest = stored["manifest"]
+    if manifest:
+        manifest = {
+            **manifest,
+            "src": base + manifest["src"],
+            "srcset": {
+                fmt: ", ".join(base + entry for entry in srcset.split(", "))
+                for fmt, srcset in manifest["srcset"].items()
+            },
+            "variants": [{**v, "url": base + v["url"]} for v in manifest["variants"]],
+        }
+    return ImageUploadResponse(url=base + stored["url"], filename=stored["filename"], manifest=manifest)
+
+
+# Image Upload: store content-addressed derivatives under backend/uploads and return served URLs
 @router.post("/upload-image", response_model=ImageUploadResponse)
 async def upload_image(
     request: Request,
     file: UploadFile = File(...),
-    current_user: dict = Depends(require_admin)
+    current_user: dict = Depends(require_editor)
+):
+    # Copied to disk in chunks and capped; larger files go through /uploads sessions
+    spooled = await spool(upload_file_chunks(file), UPLOAD_RESUMABLE_THRESHOLD)
+    try:
+        # Resizing and encoding is CPU-bound; keep it off the event loop
+        stored = await run_io(store_upload, spooled, file.filename)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Upload failed: {e}")
+    return _upload_response(request, stored)
+
+
+# Resumable uploads: create a session, PUT raw chunks with Upload-Offset, resume from GET
+@router.post("/uploads", response_model=UploadSession, status_code=201)
+async def create_upload_session(body: UploadSessionCreate, current_user: dict = Depends(require_editor)):
+    return await run_io(create_session, body.filename, body.size)
+
+
+@router.get("/uploads/{upload_id}", response_model=UploadSession)
+async def get_upload_session(upload_id: str, current_user: dict = Depends(require_editor)):
+    return await run_io(get_session, upload_id)
+
+
+@router.put("/uploads/{upload_id}")
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    current_user: dict = Depends(require_editor)
 ):
+    """Append the request body at ``Upload-Offset``; returns the stored file once complete"""
+    try:
+        offset = int(request.headers.get("upload-offset", ""))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Upload-Offset header is required")
+    session = await append_chunk(upload_id, offset, request.stream())
+    if session["offset"] < session["size"]:
+        return UploadSession(**session)
+    spooled = await finish_session(upload_id)
     try:
-        uploads_dir = Path(__file__).parent / "uploads"
-        uploads_dir.mkdir(exist_ok=True)
-        ext = os.path.splitext(file.filename)[1].lower()
-        safe_name = f"{uuid.uuid4().hex}{ext}"
-        dest = uploads_dir / safe_name
-        content = await file.read()
-        with open(dest, "wb") as f:
-            f.write(content)
-        base = str(request.base_url).rstrip("/")
-        url = f"{base}/uploads/{safe_name}"
-        return ImageUploadResponse(url=url, filename=safe_name)
+        stored = await run_io(store_upload, spooled, session["filename"])
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {e}")
+    return _upload_response(request, stored)
+
+
+@router.delete("/uploads/{upload_id}")
+async def delete_upload_session(upload_id: str, current_user: dict = Depends(require_editor)):
+    await run_io(cancel_session, upload_id)
+    return {"message": "Upload session cancelled"}
 
 
 # Catalogs CRUD
-@router.get("/catalogs", dependencies=[Depends(require_admin)])
+@router.get("/catalogs", dependencies=[Depends(require_editor)])
 async def get_all_catalogs():
     try:
-        catalogs = await db.catalogs.find().sort("order", 1).to_list(length=100)
+        catalogs = await db.catalogs.find({}, {"_id": 0}).sort("order", 1).to_list(length=None)
         return catalogs
     except Exception:
         return []
 
 
-@router.get("/catalogs/{catalog_id}", dependencies=[Depends(require_admin)])
+@router.get("/catalogs/{catalog_id}", dependencies=[Depends(require_editor)])
 async def get_catalog(catalog_id: str):
     try:
         catalog = await db.catalogs.find_one({"id": catalog_id})
@@ -338,26 +542,29 @@ async def get_catalog(catalog_id: str):
     return catalog
 
 
-@router.post("/catalogs", dependencies=[Depends(require_admin)])
+@router.post("/catalogs", dependencies=[Depends(require_editor)])
 async def create_catalog(catalog: Catalog):
     catalog_dict = catalog.dict()
     await db.catalogs.insert_one(catalog_dict)
+    catalog_cache.invalidate("catalogs")
     return catalog
 
 
-@router.put("/catalogs/{catalog_id}", dependencies=[Depends(require_admin)])
+@router.put("/catalogs/{catalog_id}", dependencies=[Depends(require_editor)])
 async def update_catalog(catalog_id: str, catalog: Catalog):
     catalog_dict = catalog.dict()
     catalog_dict["id"] = catalog_id
     result = await db.catalogs.replace_one({"id": catalog_id}, catalog_dict)
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Catalog not found")
+    catalog_cache.invalidate("catalogs")
     return catalog
 
 
-@router.delete("/catalogs/{catalog_id}", dependencies=[Depends(require_admin)])
+@router.delete("/catalogs/{catalog_id}", dependencies=[Depends(require_editor)])
 async def delete_catalog(catalog_id: str):
     result = await db.catalogs.delete_one({"id": catalog_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Catalog not found")
+    catalog_cache.invalidate("catalogs")
     return {"message": "Catalog deleted"}
@@ -0,0 +1,143 @@
+"""Admin and editor accounts stored in the ``admin_users`` collection.
+
+Login looks users up through a short-lived in-process cache, so a morning
+login rush costs one indexed ``find_one`` per user per TTL rather than one
+per attempt. Passwords are checked in the auth hash pool; a hash made with
+an outdated scheme or cost is replaced on the next successful login.
+
+The first boot against an empty collection creates ``ADMIN_USERNAME`` with
+``ADMIN_PASSWORD_HASH`` (or a hash of ``ADMIN_PASSWORD``).
+"""
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from auth import get_password_hash, pwd_context, run_hash, verify_and_update
+
+logger = logging.getLogger(__name__)
+
+ADMIN_USER_CACHE_TTL = float(os.environ.get("ADMIN_USER_CACHE_TTL", "60"))
+DEFAULT_ADMIN_USERNAME = os.environ.get("ADMIN_USERNAME", "admin")
+DEFAULT_ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "admin123")
+
+USER_PROJECTION = {"_id": 0}
+PUBLIC_USER_PROJECTION = {"_id": 0, "password_hash": 0}
+
+# username -> (expires at, user record); only existing users are cached
+_users: Dict[str, Tuple[float, dict]] = {}
+
+
+def _remember(user: dict) -> dict:
+    _users[user["username"]] = (time.monotonic() + ADMIN_USER_CACHE_TTL, user)
+    return user
+
+
+def forget(username: str) -> None:
+    _users.pop(username, None)
+
+
+async def get_user(db, username: str) -> Optional[dict]:
+    entry = _users.get(username)
+    if entry is not None and entry[0] > time.monotonic():
+        return entry[1]
+    user = await db.admin_users.find_one({"username": username}, USER_PROJECTION)
+    if user is None:
+        forget(username)
+        return None
+    return _remember(user)
+
+
+async def authenticate(db, username: str, password: str) -> Optional[dict]:
+    """The user record if the password matches, upgrading its hash when outdated"""
+    user = await get_user(db, username)
+    if user is None:
+        # Take as long as a real check so unknown usernames can't be probed by timing
+        await run_hash(pwd_context.dummy_verify)
+        return None
+    valid, new_hash = await run_hash(verify_and_update, password, user["password_hash"])
+    if not valid:
+        return None
+    if new_hash:
+        try:
+            await db.admin_users.update_one(
+                {"username": username},
+                {"$set": {"password_hash": new_hash, "updated_at": datetime.now(timezone.utc)}},
+            )
+            user = _remember({**user, "password_hash": new_hash})
+            logger.info(f"Rehashed password for {username}")
+        except Exception as e:
+            # The old hash still verifies; try again next login
+            logger.warning(f"Could not store rehashed password for {username}: {e}")
+    return user
+
+
+async def list_users(db) -> List[dict]:
+    return await db.admin_users.find({}, PUBLIC_USER_PROJECTION).sort("username", 1).to_list(length=None)
+
+
+async def create_user(db, username: str, password: str, role: str) -> dict:
+    now = datetime.now(timezone.utc)
+    user = {
+        "username": username,
+        "password_hash": await run_hash(get_password_hash, password),
+        "role": role,
+        "created_at": now,
+        "updated_at": now,
+    }
+    try:
+        await db.admin_users.insert_one(dict(user))
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Username already exists")
+    forget(username)
+    return {key: value for key, value in user.items() if key != "password_hash"}
+
+
+async def update_user(db, username: str, password: Optional[str] = None, role: Optional[str] = None) -> dict:
+    changes = {"updated_at": datetime.now(timezone.utc)}
+    if password is not None:
+        changes["password_hash"] = await run_hash(get_password_hash, password)
+    if role is not None:
+        changes["role"] = role
+    user = await db.admin_users.find_one_and_update(
+        {"username": username}, {"$set": changes}, projection=PUBLIC_USER_PROJECTION, return_document=ReturnDocument.AFTER
+    )
+    forget(username)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+
+async def delete_user(db, username: str) -> None:
+    result = await db.admin_users.delete_one({"username": username})
+    forget(username)
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="User not found")
+
+
+async def ensure_default_admin(db) -> None:
+    """Create the bootstrap admin when no users exist yet"""
+    try:
+        if await db.admin_users.estimated_document_count() > 0:
+            return
+        password_hash = os.environ.get("ADMIN_PASSWORD_HASH") or await run_hash(get_password_hash, DEFAULT_ADMIN_PASSWORD)
+        now = datetime.now(timezone.utc)
+        # Upsert so workers booting together create it once
+        await db.admin_users.update_one(
+            {"username": DEFAULT_ADMIN_USERNAME},
+            {"$setOnInsert": {
+                "username": DEFAULT_ADMIN_USERNAME, "password_hash": password_hash, "role": "admin",
+                "created_at": now, "updated_at": now,
+            }},
+            upsert=True,
+        )
+        logger.info(f"Created default admin user '{DEFAULT_ADMIN_USERNAME}'")
+        if "ADMIN_PASSWORD_HASH" not in os.environ and "ADMIN_PASSWORD" not in os.environ:
+            logger.warning("Default admin uses the built-in password; change it after first login")
+    except Exception as e:
+        logger.warning(f"Skipping default admin setup: {e}")
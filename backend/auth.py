@@ -2,31 +2,61 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
+import asyncio
+import hashlib
 import os
+import time
 
 # Security configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440  # 24 hours
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "256"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hash scheme and cost are per deployment. The first scheme hashes new
+# passwords; hashes made with any other scheme or cost are upgraded on the
+# next successful login (see admin_users.authenticate).
+# Measure with tools/bench_password_hash.py before changing the cost.
+PASSWORD_SCHEMES = [s.strip() for s in os.getenv("PASSWORD_SCHEMES", "bcrypt").split(",") if s.strip()]
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "65536"))  # KiB
+
+# Roles allowed to manage content; user management and settings stay admin-only
+EDITOR_ROLES = ("admin", "editor")
+
+
+def build_password_context(schemes=None, bcrypt_rounds=None) -> CryptContext:
+    settings = {"bcrypt__rounds": bcrypt_rounds or BCRYPT_ROUNDS}
+    if "argon2" in (schemes or PASSWORD_SCHEMES):
+        settings.update(argon2__time_cost=ARGON2_TIME_COST, argon2__memory_cost=ARGON2_MEMORY_COST)
+    return CryptContext(schemes=schemes or PASSWORD_SCHEMES, deprecated="auto", **settings)
+
+
+pwd_context = build_password_context()
 security = HTTPBearer()
 
-# Default admin credentials (in production, store in database with hashed password)
-ADMIN_USER = {
-    "username": "admin",
-    "password_hash": pwd_context.hash("admin123"),
-    "role": "admin"
-}
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+# bcrypt is deliberately slow; run it off the event loop, a few at a time
+_hash_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("AUTH_HASH_WORKERS", "2")),
+    thread_name_prefix="auth-hash",
+)
+
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+
+def verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """``(valid, new_hash)``: ``new_hash`` is set when the stored hash is outdated"""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -37,9 +67,41 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+
+async def run_hash(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_hash_pool, fn, *args)
+
+
+# sha256(token) -> (payload, exp timestamp), most recently used last
+_verified_tokens: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+
+
+def _cached_payload(digest: str) -> Optional[dict]:
+    entry = _verified_tokens.get(digest)
+    if entry is None:
+        return None
+    payload, expires = entry
+    if expires <= time.time():
+        del _verified_tokens[digest]
+        return None
+    _verified_tokens.move_to_end(digest)
+    return payload
+
+
+def _remember_payload(digest: str, payload: dict) -> None:
+    _verified_tokens[digest] = (payload, float(payload["exp"]))
+    while len(_verified_tokens) > TOKEN_CACHE_SIZE:
+        _verified_tokens.popitem(last=False)
+
+
+async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    token = credentials.credentials
+    # Dashboards fire dozens of calls with one token; verify its signature once
+    digest = hashlib.sha256(token.encode()).hexdigest()
+    payload = _cached_payload(digest)
+    if payload is not None:
+        return dict(payload)
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
@@ -47,23 +109,51 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials",
             )
-        return payload
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
         )
+    if "exp" in payload:
+        _remember_payload(digest, payload)
+    return dict(payload)
+
+
+async def current_user(payload: dict = Depends(verify_token)):
+    """The token's claims with the role as stored now.
+
+    Tokens live for a day, so the role is not taken from the token: a deleted
+    or demoted user loses access within ``ADMIN_USER_CACHE_TTL`` seconds.
+    """
+    # admin_users imports this module for password hashing
+    from admin_users import get_user
+    from database import db
+
+    try:
+        user = await get_user(db, payload["sub"])
+    except Exception:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+        )
+    return {**payload, "role": user["role"]}
 
-def authenticate_user(username: str, password: str):
-    if username == ADMIN_USER["username"]:
-        if verify_password(password, ADMIN_USER["password_hash"]):
-            return ADMIN_USER
-    return None
 
-def require_admin(payload: dict = Depends(verify_token)):
+async def require_admin(payload: dict = Depends(current_user)):
     if payload.get("role") != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
         )
-    return payload
\ No newline at end of file
+    return payload
+
+
+async def require_editor(payload: dict = Depends(current_user)):
+    if payload.get("role") not in EDITOR_ROLES:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    return payload
@@ -0,0 +1,230 @@
+"""Bulk product import: parse, validate in batches, upsert with ``bulk_write``.
+
+Imports run as background jobs; ``import_jobs`` holds their progress so the
+admin UI can poll it. Rows carrying an ``id`` update that product (or create
+it with that id), rows without one are inserted with a fresh id. Updates only
+``$set`` the fields a row actually carries, so a partial row (e.g. a CSV
+without description columns) leaves the other stored fields alone.
+"""
+import asyncio
+import csv
+import io
+import json
+import os
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field, ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from cache import catalog_cache
+from export import COMPONENT_FIELDS, SPEC_FIELDS
+from models import LANGUAGES, ProductCreate
+from product_cards import upsert_cards
+from search import search_index
+
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", "500"))
+IMPORT_MAX_BYTES = int(os.environ.get("IMPORT_MAX_BYTES", str(50 * 1024 * 1024)))
+# Finished jobs kept for polling
+IMPORT_JOBS_RETAINED = 20
+
+IMPORT_FORMATS = ("json", "ndjson", "csv")
+
+
+class ImportRowError(BaseModel):
+    row: int
+    id: Optional[str] = None
+    error: str
+
+
+class ImportJob(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    status: str = "pending"  # pending | running | completed | failed
+    format: str
+    total: int = 0
+    processed: int = 0
+    inserted: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []
+    detail: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+
+
+import_jobs: "OrderedDict[str, ImportJob]" = OrderedDict()
+_tasks: Dict[str, asyncio.Task] = {}
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    name = (filename or "").lower()
+    for fmt in IMPORT_FORMATS:
+        if name.endswith(f".{fmt}"):
+            return fmt
+    if name.endswith(".jsonl"):
+        return "ndjson"
+    content_type = (content_type or "").split(";")[0].strip()
+    return {
+        "application/json": "json",
+        "application/x-ndjson": "ndjson",
+        "text/csv": "csv",
+    }.get(content_type)
+
+
+def parse_rows(data: bytes, fmt: str) -> List[Tuple[int, Any]]:
+    """Split the payload into ``(row_number, raw_row)``; unparsable rows keep their error"""
+    text = data.decode("utf-8-sig")
+    if fmt == "json":
+        payload = json.loads(text)
+        if isinstance(payload, dict):
+            payload = payload.get("products", [payload])
+        return list(enumerate(payload, start=1))
+    if fmt == "ndjson":
+        rows = []
+        for number, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                rows.append((number, json.loads(line)))
+            except json.JSONDecodeError as e:
+                rows.append((number, ValueError(f"Invalid JSON: {e}")))
+        return rows
+    return _parse_csv(text)
+
+
+def _parse_csv(text: str) -> List[Tuple[int, Any]]:
+    """Group export-style CSV rows (one per ProductModel) back into products.
+
+    Rows sharing a ``product_id`` become one product; rows without one are
+    products of their own. Only the ``name_<lang>``/``description_<lang>``
+    columns present are set, and ``images`` (separated by ``|``) and the model
+    columns are optional; whatever is absent is left out of the row so an
+    update keeps the stored values.
+    """
+    products: "OrderedDict[str, Tuple[int, dict]]" = OrderedDict()
+    reader = csv.DictReader(io.StringIO(text))
+    columns = set(reader.fieldnames or ())
+    name_languages = [lang for lang in LANGUAGES if f"name_{lang}" in columns]
+    description_languages = [lang for lang in LANGUAGES if f"description_{lang}" in columns]
+    for number, row in enumerate(reader, start=2):
+        key = row.get("product_id") or f"__row{number}"
+        if key not in products:
+            product = {
+                "name": {lang: row.get(f"name_{lang}") or "" for lang in name_languages},
+                "category": row.get("category") or "",
+            }
+            if description_languages:
+                product["description"] = {lang: row.get(f"description_{lang}") or "" for lang in description_languages}
+            if "images" in columns:
+                product["images"] = [url for url in (row.get("images") or "").split("|") if url]
+            if row.get("product_id"):
+                product["id"] = row["product_id"]
+            products[key] = (number, product)
+        if row.get("model_name"):
+            products[key][1].setdefault("models", []).append({
+                "model_name": row["model_name"],
+                "technical_specs": {f: row[f] for f in SPEC_FIELDS if row.get(f)},
+                "components": {f: row[f"component_{f}"] for f in COMPONENT_FIELDS if row.get(f"component_{f}")},
+            })
+    return list(products.values())
+
+
+def validate_batch(rows: List[Tuple[int, Any]]) -> Tuple[List[Tuple[int, str, dict, dict]], List[ImportRowError]]:
+    """Valid rows as ``(row, id, fields present in the row, defaults for inserts)``"""
+    valid, errors = [], []
+    for number, raw in rows:
+        if isinstance(raw, Exception):
+            errors.append(ImportRowError(row=number, error=str(raw)))
+            continue
+        if not isinstance(raw, dict):
+            errors.append(ImportRowError(row=number, error="Row is not an object"))
+            continue
+        product_id = raw.get("id") or str(uuid.uuid4())
+        try:
+            # A new product still needs a description; updates without one keep theirs
+            product = ProductCreate(**{"description": "", **raw})
+        except ValidationError as e:
+            errors.append(ImportRowError(row=number, id=raw.get("id"), error=str(e)))
+            continue
+        fields = product.dict()
+        present = {key: value for key, value in fields.items() if key in raw}
+        defaults = {key: value for key, value in fields.items() if key not in raw}
+        for key, given in raw.items():
+            value = present.get(key)
+            if isinstance(given, dict) and isinstance(value, dict) and set(given) < set(value):
+                # Some languages only (e.g. just name_tr in a CSV): the others keep their stored text
+                del present[key]
+                present.update({f"{key}.{lang}": value[lang] for lang in given})
+                defaults.update({f"{key}.{lang}": value[lang] for lang in value if lang not in given})
+        valid.append((number, str(product_id), present, defaults))
+    return valid, errors
+
+
+async def _write_batch(db, job: ImportJob, valid: List[Tuple[int, str, dict, dict]]) -> None:
+    if not valid:
+        return
+    now = datetime.utcnow()
+    operations = [
+        UpdateOne(
+            {"id": product_id},
+            {"$set": fields, "$setOnInsert": {**defaults, "id": product_id, "created_at": now}},
+            upsert=True,
+        )
+        for _, product_id, fields, defaults in valid
+    ]
+    try:
+        result = await db.products.bulk_write(operations, ordered=False)
+        details = result.bulk_api_result
+    except BulkWriteError as e:
+        details = e.details
+        for write_error in details.get("writeErrors", []):
+            number, product_id, _, _ = valid[write_error["index"]]
+            job.errors.append(ImportRowError(row=number, id=product_id, error=write_error.get("errmsg", "")))
+            job.failed += 1
+    job.inserted += details.get("nUpserted", 0)
+    job.updated += details.get("nMatched", 0)
+    try:
+        await upsert_cards(db, [product_id for _, product_id, _, _ in valid])
+    except Exception as e:
+        # Cards are derived data; rebuild_cards can catch them up later
+        job.detail = f"Product cards not refreshed: {e}"
+
+
+async def run_import(db, job: ImportJob, data: bytes) -> None:
+    job.status = "running"
+    try:
+        rows = await asyncio.to_thread(parse_rows, data, job.format)
+        job.total = len(rows)
+        for start in range(0, len(rows), IMPORT_BATCH_SIZE):
+            batch = rows[start:start + IMPORT_BATCH_SIZE]
+            valid, errors = await asyncio.to_thread(validate_batch, batch)
+            job.errors.extend(errors)
+            job.failed += len(errors)
+            await _write_batch(db, job, valid)
+            job.processed += len(batch)
+        job.status = "completed"
+    except Exception as e:
+        job.status = "failed"
+        job.detail = str(e)
+    finally:
+        job.finished_at = datetime.utcnow()
+        if job.inserted or job.updated:
+            catalog_cache.invalidate("products")
+            search_index.mark_stale()
+
+
+def start_import(db, data: bytes, fmt: str) -> ImportJob:
+    job = ImportJob(format=fmt)
+    import_jobs[job.id] = job
+    while len(import_jobs) > IMPORT_JOBS_RETAINED:
+        oldest_id, oldest = next(iter(import_jobs.items()))
+        if oldest.status in ("pending", "running"):
+            break
+        del import_jobs[oldest_id]
+    task = asyncio.create_task(run_import(db, job, data))
+    _tasks[job.id] = task
+    task.add_done_callback(lambda _: _tasks.pop(job.id, None))
+    return job
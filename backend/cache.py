@@ -0,0 +1,133 @@
+"""In-process read-through cache for the public catalog endpoints.
+
+Entries are grouped by namespace (one per collection). Every namespace carries a
+version counter that is part of each key, so bumping it on an admin write makes
+all earlier entries unreachable at once; they are also dropped eagerly.
+
+The cache lives in each worker process and invalidation only reaches the
+worker that handled the write. With several workers the others keep serving
+their entries until ``CATALOG_CACHE_TTL`` expires, so the TTL is the upper
+bound on staleness after an admin edit; keep it short when running more than
+one worker.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+_MISS = object()
+
+
+class CatalogCache:
+    """Versioned TTL + LRU cache with single-flight loading"""
+
+    def __init__(self, maxsize: int = 512, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+
+    def version(self, namespace: str) -> int:
+        return self._versions.get(namespace, 0)
+
+    def _key(self, namespace: str, params: Optional[dict]) -> Tuple:
+        items = tuple(sorted((params or {}).items()))
+        return (namespace, self.version(namespace), items)
+
+    def _lookup(self, key: Tuple) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISS
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return _MISS
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key: Tuple, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get(self, namespace: str, params: Optional[dict] = None) -> Any:
+        value = self._lookup(self._key(namespace, params))
+        return None if value is _MISS else value
+
+    def set(self, namespace: str, params: Optional[dict], value: Any) -> None:
+        self._store(self._key(namespace, params), value)
+
+    async def get_or_load(
+        self,
+        namespace: str,
+        params: Optional[dict],
+        loader: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Return the cached value or await ``loader`` once for concurrent callers.
+
+        Loader exceptions propagate and are never cached, so route fallbacks
+        for an unavailable database keep working unchanged.
+        """
+        key = self._key(namespace, params)
+        value = self._lookup(key)
+        if value is not _MISS:
+            self.hits += 1
+            return value
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark as retrieved so an unawaited future doesn't log a warning
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        # A write that landed while we were loading bumped the version; don't
+        # store a result that may predate it.
+        if key[1] == self.version(namespace):
+            self._store(key, value)
+        future.set_result(value)
+        return value
+
+    def invalidate(self, *namespaces: str) -> None:
+        for namespace in namespaces:
+            self._versions[namespace] = self.version(namespace) + 1
+        stale = [key for key in self._entries if key[0] in namespaces]
+        for key in stale:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self.invalidate(*{key[0] for key in self._entries} | set(self._versions))
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "versions": dict(self._versions),
+        }
+
+
+catalog_cache = CatalogCache(
+    maxsize=int(os.environ.get("CATALOG_CACHE_MAXSIZE", "512")),
+    # Per process: other workers see an admin write only after this many seconds
+    ttl=float(os.environ.get("CATALOG_CACHE_TTL", "60")),
+)
@@ -0,0 +1,73 @@
+"""Side-by-side comparison of product models.
+
+All requested products come back from one ``$in`` query. Every
+``ProductModel`` becomes a column and every ``TechnicalSpec`` /
+``ComponentsUsed`` field a row, so the client renders the table as-is.
+Rows nobody fills are dropped, and ``differs`` marks rows whose filled
+values are not all the same.
+"""
+import os
+from typing import Any, Dict, List
+
+from fastapi import HTTPException
+
+from export import COMPONENT_FIELDS, SPEC_FIELDS
+
+COMPARE_MAX_PRODUCTS = int(os.environ.get("COMPARE_MAX_PRODUCTS", "6"))
+
+COMPARE_PROJECTION = {"_id": 0, "id": 1, "name": 1, "category": 1, "images": 1, "image": 1, "models": 1}
+
+
+def parse_ids(ids: str) -> List[str]:
+    """``"b,a,b"`` -> ``["a", "b"]``: the canonical order is also the cache key"""
+    selected = sorted({i.strip() for i in ids.split(",") if i.strip()})
+    if not selected:
+        raise HTTPException(status_code=400, detail="ids is required")
+    if len(selected) > COMPARE_MAX_PRODUCTS:
+        raise HTTPException(status_code=400, detail=f"At most {COMPARE_MAX_PRODUCTS} products can be compared")
+    return selected
+
+
+def _normalized(value: Any) -> Any:
+    # "92 %" and "92%" are the same figure
+    return "".join(value.split()).lower() if isinstance(value, str) else value
+
+
+def _rows(columns: List[dict], section: str, fields: List[str]) -> List[dict]:
+    rows = []
+    for field in fields:
+        values = [(column.get(section) or {}).get(field) for column in columns]
+        filled = [_normalized(value) for value in values if value not in (None, "")]
+        if not filled:
+            continue
+        rows.append({
+            "field": field,
+            "values": values,
+            # A blank next to a filled value counts as a difference
+            "differs": len(set(filled)) > 1 or len(filled) < len(values),
+        })
+    return rows
+
+
+def build_matrix(products: List[dict], ids: List[str]) -> Dict[str, Any]:
+    by_id = {product["id"]: product for product in products}
+    ordered = [by_id[product_id] for product_id in ids if product_id in by_id]
+    columns = []
+    for product in ordered:
+        for model in product.get("models") or []:
+            columns.append({"product_id": product["id"], **model})
+    return {
+        "products": [
+            {
+                "id": product["id"],
+                "name": product.get("name", ""),
+                "category": product.get("category", ""),
+                "cover": (product.get("images") or [product.get("image")])[0],
+            }
+            for product in ordered
+        ],
+        "missing": [product_id for product_id in ids if product_id not in by_id],
+        "columns": [{"product_id": column["product_id"], "model_name": column.get("model_name", "")} for column in columns],
+        "technical_specs": _rows(columns, "technical_specs", SPEC_FIELDS),
+        "components": _rows(columns, "components", COMPONENT_FIELDS),
+    }
@@ -0,0 +1,202 @@
+"""gzip/brotli response compression with per-route settings.
+
+A plain ASGI middleware (rather than Starlette's ``GZipMiddleware``) so it
+can pick brotli when the client accepts it, tune levels per route, and
+leave alone responses that are already encoded (precompressed ``/uploads``
+siblings), partial (206) or not worth compressing (images, PDFs).
+
+Single-body responses below the route's ``minimum_size`` pass through.
+Streaming responses (the NDJSON/CSV export) are compressed chunk by chunk
+and flushed after each one, so clients keep receiving data progressively.
+
+Every compressible response under a rule gets ``Vary: Accept-Encoding`` and
+a weak ETag, whether or not this particular body was compressed. A 304 has
+no Content-Type to go by, so it gets the same treatment when its origin
+declares ``Vary: Accept-Encoding`` (``http_cache`` and ``static_files`` do
+for compressible resources); a cached 200 and the 304 that revalidates it
+then always carry the same validator.
+"""
+import os
+import zlib
+from typing import NamedTuple, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from static_files import accepted_encodings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+
+COMPRESSIBLE_TYPES = (
+    "application/json", "application/x-ndjson", "application/xml", "application/javascript",
+    "image/svg+xml", "text/",
+)
+
+
+class CompressionRule(NamedTuple):
+    minimum_size: int = COMPRESSION_MIN_SIZE
+    gzip_level: int = 6
+    brotli_quality: int = 5
+
+
+# First matching path prefix wins; None disables compression for that prefix
+COMPRESSION_RULES: Tuple[Tuple[str, Optional[CompressionRule]], ...] = (
+    # Large streamed bodies: cheaper levels keep throughput up
+    ("/api/products/export", CompressionRule(minimum_size=0, gzip_level=4, brotli_quality=4)),
+    # Already-compressed image bytes
+    ("/api/img/", None),
+    ("/api/", CompressionRule()),
+    # On-the-fly only for files without a precompressed sibling
+    ("/uploads/", CompressionRule(gzip_level=6, brotli_quality=4)),
+)
+
+
+def rule_for(path: str) -> Optional[CompressionRule]:
+    for prefix, rule in COMPRESSION_RULES:
+        if path.startswith(prefix):
+            return rule
+    return None
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    return bool(content_type) and content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def mark_negotiated(headers: MutableHeaders) -> None:
+    """Headers shared by every representation of a compressible resource"""
+    if "accept-encoding" not in headers.get("vary", "").lower():
+        headers.add_vary_header("Accept-Encoding")
+    # A strong validator must differ per encoding; a weak one may be shared
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["ETag"] = "W/" + etag
+
+
+class _Encoder:
+    """Streaming encoder with an explicit flush so each chunk is decodable on arrival"""
+
+    def __init__(self, encoding: str, rule: CompressionRule):
+        self.encoding = encoding
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=rule.brotli_quality)
+        else:
+            self._gz = zlib.compressobj(rule.gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._br.process(data) + self._br.flush()
+        return self._gz.compress(data) + self._gz.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._br.process(data) + self._br.finish()
+        return self._gz.compress(data) + self._gz.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        rule = rule_for(scope["path"])
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding"))
+        if scope["method"] == "HEAD":
+            # Same headers as GET, but there is no body to encode
+            encoding = None
+        elif brotli is not None and "br" in accepted:
+            encoding = "br"
+        elif "gzip" in accepted:
+            encoding = "gzip"
+        else:
+            encoding = None
+        await _CompressingResponder(self.app, rule, encoding)(scope, receive, send)
+
+
+class _CompressingResponder:
+    def __init__(self, app: ASGIApp, rule: CompressionRule, encoding: Optional[str]):
+        self.app = app
+        self.rule = rule
+        self.encoding = encoding
+        self.send: Send = None
+        self.start: Optional[Message] = None
+        self.encoder: Optional[_Encoder] = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_wrapper)
+
+    async def send_wrapper(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Hold the headers until the first body chunk shows the response's shape
+            self.start = message
+            headers = MutableHeaders(raw=list(message["headers"]))
+            status = message["status"]
+            if status == 304:
+                if "accept-encoding" in headers.get("vary", "").lower():
+                    mark_negotiated(headers)
+            elif status not in (204, 206) and is_compressible(headers.get("content-type")):
+                mark_negotiated(headers)
+            elif "content-encoding" in headers:
+                # Precompressed /uploads siblings set their own validators
+                if "accept-encoding" not in headers.get("vary", "").lower():
+                    headers.add_vary_header("Accept-Encoding")
+            message["headers"] = headers.raw
+            self.passthrough = (
+                self.encoding is None
+                or status in (204, 206, 304)
+                or "content-encoding" in headers
+                or not is_compressible(headers.get("content-type"))
+            )
+            return
+        if message["type"] != "http.response.body":
+            # e.g. http.response.pathsend: the server sends the file itself
+            if self.start is not None:
+                start, self.start = self.start, None
+                self.passthrough = True
+                await self.send(start)
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start is not None:
+            start, self.start = self.start, None
+            if self.passthrough or (not more_body and len(body) < self.rule.minimum_size):
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+            headers = MutableHeaders(raw=start["headers"])
+            headers["Content-Encoding"] = self.encoding
+            self.encoder = _Encoder(self.encoding, self.rule)
+            if not more_body:
+                compressed = self.encoder.finish(body)
+                headers["Content-Length"] = str(len(compressed))
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+            del headers["Content-Length"]
+            await self.send(start)
+            await self.send({"type": "http.response.body", "body": self.encoder.chunk(body), "more_body": True})
+            return
+
+        if self.passthrough:
+            await self.send(message)
+        elif more_body:
+            await self.send({"type": "http.response.body", "body": self.encoder.chunk(body), "more_body": True})
+        else:
+            await self.send({"type": "http.response.body", "body": self.encoder.finish(body)})
@@ -0,0 +1,95 @@
+"""Streaming serializers for the full-catalog export.
+
+Both formats consume a Motor cursor document by document and yield encoded
+chunks of ``EXPORT_CHUNK_SIZE`` documents, so memory stays bounded and the
+first bytes go out as soon as the first batch arrives.
+"""
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List
+
+from models import LANGUAGES, ComponentsUsed, TechnicalSpec
+
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "200"))
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", "50"))
+
+SPEC_FIELDS = list(TechnicalSpec.model_fields)
+COMPONENT_FIELDS = list(ComponentsUsed.model_fields)
+
+CSV_COLUMNS = (
+    ["product_id", "category"]
+    + [f"name_{lang}" for lang in LANGUAGES]
+    + [f"description_{lang}" for lang in LANGUAGES]
+    + ["images", "model_name"]
+    + SPEC_FIELDS
+    + [f"component_{field}" for field in COMPONENT_FIELDS]
+)
+
+
+def _json_default(value: Any):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+async def ndjson_chunks(products: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    lines: List[str] = []
+    async for product in products:
+        product.pop("_id", None)
+        lines.append(json.dumps(product, ensure_ascii=False, default=_json_default))
+        if len(lines) >= EXPORT_CHUNK_SIZE:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def csv_rows(product: dict) -> List[Dict[str, Any]]:
+    """Flatten a product into one row per ProductModel (one row if it has none)"""
+    name = product.get("name")
+    base = {"product_id": product.get("id", ""), "category": product.get("category", "")}
+    for lang in LANGUAGES:
+        if isinstance(name, dict):
+            base[f"name_{lang}"] = name.get(lang, "")
+        else:
+            # Legacy plain-string names go in the first language column
+            base[f"name_{lang}"] = (name or "") if lang == LANGUAGES[0] else ""
+    description = product.get("description")
+    for lang in LANGUAGES:
+        if isinstance(description, dict):
+            base[f"description_{lang}"] = description.get(lang, "")
+        else:
+            base[f"description_{lang}"] = (description or "") if lang == LANGUAGES[0] else ""
+    # Same separator bulk_import splits on
+    base["images"] = "|".join(product.get("images") or [])
+
+    rows = []
+    for model in product.get("models") or []:
+        row = dict(base, model_name=model.get("model_name", ""))
+        specs = model.get("technical_specs") or {}
+        components = model.get("components") or {}
+        for field in SPEC_FIELDS:
+            row[field] = specs.get(field) or ""
+        for field in COMPONENT_FIELDS:
+            row[f"component_{field}"] = components.get(field) or ""
+        rows.append(row)
+    return rows or [base]
+
+
+async def csv_chunks(products: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, restval="")
+    writer.writeheader()
+    pending = 0
+    async for product in products:
+        writer.writerows(csv_rows(product))
+        pending += 1
+        if pending >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue().encode("utf-8")
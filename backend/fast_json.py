@@ -0,0 +1,62 @@
+"""Fast JSON encoding for responses.
+
+``FastJSONResponse`` (the app's default response class) encodes with
+orjson, which handles ``datetime``/``UUID`` natively and serializes
+Pydantic models through ``model_dump`` without going through
+``jsonable_encoder``. Handlers that already built validated models can
+return ``model_response(...)``: FastAPI skips ``response_model``
+re-validation for Response objects, so the models are dumped exactly once.
+Falls back to the standard library encoder when orjson isn't installed.
+"""
+import json
+from typing import Any, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return str(value)
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        jsonable_encoder(content),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def plain(content: Any) -> Any:
+    """Dump models to dicts (values stay native) so dict-walking helpers can read them"""
+    if isinstance(content, BaseModel):
+        return content.model_dump()
+    if isinstance(content, list):
+        return [plain(item) for item in content]
+    if isinstance(content, dict):
+        return {key: plain(value) for key, value in content.items()}
+    return content
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def model_response(content: Any, status_code: int = 200, headers: Optional[dict] = None) -> FastJSONResponse:
+    """Return already-validated models without ``response_model`` re-validation"""
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
@@ -0,0 +1,80 @@
+"""HTTP validators (ETag / If-None-Match) and Cache-Control for public GETs.
+
+Responses are rendered to bytes once per cache fill and stored in
+``catalog_cache`` together with their ETag, so a repeat visitor costs a dict
+lookup and either a 304 or a pre-encoded body.
+"""
+import hashlib
+import os
+from typing import Any, Awaitable, Callable, NamedTuple, Optional
+
+from fastapi import Request, Response
+
+from cache import catalog_cache
+from fast_json import dumps, plain
+from i18n import localize
+
+HTTP_CACHE_MAX_AGE = int(os.environ.get("HTTP_CACHE_MAX_AGE", "60"))
+HTTP_CACHE_STALE_WHILE_REVALIDATE = int(os.environ.get("HTTP_CACHE_STALE_WHILE_REVALIDATE", "300"))
+
+
+class RenderedJSON(NamedTuple):
+    body: bytes
+    etag: str
+
+
+def render_json(content: Any, lang: Optional[str] = None) -> RenderedJSON:
+    # Same encoding as the app's default FastJSONResponse
+    if lang is not None:
+        content = localize(plain(content), lang)
+    body = dumps(content)
+    return RenderedJSON(body=body, etag=f'"{hashlib.sha1(body).hexdigest()}"')
+
+
+def cache_control_header() -> str:
+    return f"public, max-age={HTTP_CACHE_MAX_AGE}, stale-while-revalidate={HTTP_CACHE_STALE_WHILE_REVALIDATE}"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison function (RFC 9110 13.1.2)
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def conditional_response(request: Request, rendered: RenderedJSON) -> Response:
+    # Declared on the 304 too, so CompressionMiddleware gives it the same validator as the 200
+    vary = ["Accept-Encoding"]
+    if getattr(request.state, "vary_accept_language", False):
+        vary.append("Accept-Language")
+    headers = {"ETag": rendered.etag, "Cache-Control": cache_control_header(), "Vary": ", ".join(vary)}
+    if etag_matches(request.headers.get("if-none-match"), rendered.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=rendered.body, media_type="application/json", headers=headers)
+
+
+async def cached_json(
+    request: Request,
+    namespace: str,
+    params: Optional[dict],
+    loader: Callable[[], Awaitable[Any]],
+    lang: Optional[str] = None,
+) -> Optional[Response]:
+    """Serve ``loader``'s result through the catalog cache with validators.
+
+    ``lang`` collapses MultiLangText fields before rendering and is part of
+    the cache key. Returns ``None`` when the loader found nothing so the
+    route can 404. Loader exceptions propagate to the route's own fallback.
+    """
+    async def load_rendered():
+        content = await loader()
+        return None if content is None else render_json(content, lang)
+
+    params = {**(params or {}), "lang": lang}
+    rendered = await catalog_cache.get_or_load(namespace, params, load_rendered)
+    if rendered is None:
+        return None
+    return conditional_response(request, rendered)
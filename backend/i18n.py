@@ -0,0 +1,103 @@
+"""Server-side language resolution for ``MultiLangText | str`` fields.
+
+With ``lang=<code>`` (or ``lang=auto`` to negotiate from Accept-Language)
+public responses collapse every ``{"tr": ..., "en": ..., ...}`` object to a
+single string, walking the fallback chain until a non-empty translation is
+found. Legacy plain strings are left as they are. Without ``lang`` responses
+keep all translations, as before.
+"""
+from typing import Any, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from fast_json import FastJSONResponse, plain
+from models import LANGUAGES
+
+DEFAULT_LANGUAGE = "tr"
+
+LANGUAGE_FALLBACKS = {
+    "tr": ("tr", "en"),
+    "en": ("en", "tr"),
+    "ru": ("ru", "en", "tr"),
+    "it": ("it", "en", "tr"),
+}
+
+_LANGUAGE_KEYS = frozenset(LANGUAGES)
+
+
+def explicit_fallbacks(lang: str) -> Tuple[str, ...]:
+    """``lang`` and its configured fallbacks, e.g. ``("tr", "en")``"""
+    return LANGUAGE_FALLBACKS.get(lang, (lang,))
+
+
+def fallback_chain(lang: str) -> Tuple[str, ...]:
+    """Explicit fallbacks, then every other language as a last resort"""
+    chain = explicit_fallbacks(lang)
+    return chain + tuple(code for code in LANGUAGES if code not in chain)
+
+
+def negotiate(accept_language: Optional[str]) -> Optional[str]:
+    """Pick the best supported language from an Accept-Language header"""
+    if not accept_language:
+        return None
+    ranked = []
+    for position, part in enumerate(accept_language.split(",")):
+        tag, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                continue
+        code = tag.strip().split("-")[0].lower()
+        if code in _LANGUAGE_KEYS and quality > 0:
+            ranked.append((-quality, position, code))
+    return min(ranked)[2] if ranked else None
+
+
+def resolve_lang(request: Request, lang: Optional[str] = None) -> Optional[str]:
+    """FastAPI dependency reading ``lang``; ``lang=auto`` uses Accept-Language"""
+    if lang is None:
+        return None
+    if lang == "auto":
+        request.state.vary_accept_language = True
+        return negotiate(request.headers.get("accept-language")) or DEFAULT_LANGUAGE
+    if lang not in _LANGUAGE_KEYS:
+        raise HTTPException(status_code=400, detail=f"Unsupported language: {lang}")
+    return lang
+
+
+def is_multilang(value: Any) -> bool:
+    return (
+        isinstance(value, dict)
+        and bool(value)
+        and value.keys() <= _LANGUAGE_KEYS
+        and all(isinstance(text, str) for text in value.values())
+    )
+
+
+def resolve_text(value: Any, lang: str) -> Any:
+    if not is_multilang(value):
+        return value
+    for code in fallback_chain(lang):
+        if value.get(code):
+            return value[code]
+    return ""
+
+
+def localize(data: Any, lang: Optional[str]) -> Any:
+    """Collapse every MultiLangText object in JSON-compatible ``data``"""
+    if lang is None:
+        return data
+    if isinstance(data, dict):
+        if is_multilang(data):
+            return resolve_text(data, lang)
+        return {key: localize(value, lang) for key, value in data.items()}
+    if isinstance(data, list):
+        return [localize(item, lang) for item in data]
+    return data
+
+
+def localized_response(content: Any, lang: Optional[str]) -> FastJSONResponse:
+    """Localize a handler's fallback content and encode it directly, skipping response_model"""
+    return FastJSONResponse(localize(plain(content), lang))
@@ -0,0 +1,277 @@
+"""On-demand resized/cropped variants of files under ``uploads/``.
+
+``/api/img/{path}`` renders a whitelisted size of any image in the uploads
+tree. Renders run on a bounded worker pool and land in a disk cache whose
+total size is capped with LRU eviction; concurrent requests for the same
+variant share a single render. Cache keys include the source's mtime and
+size, so replacing a file naturally produces new variants.
+
+Each worker process indexes the shared cache directory on its own, so
+``IMG_CACHE_MAX_BYTES`` caps what one worker has rendered or seen on disk
+at startup, not the directory total (which can reach workers x the cap).
+A worker may also delete a file another worker still lists; lookups check
+the file is there and treat a missing one as a miss.
+"""
+import asyncio
+import hashlib
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+from images import IMAGE_EXTENSIONS, IMAGE_QUALITY, UPLOADS_DIR, flatten_alpha, normalize_mode
+
+IMG_CACHE_DIR = Path(os.environ.get("IMG_CACHE_DIR", str(Path(__file__).parent / ".img_cache")))
+# Per worker process, see above
+IMG_CACHE_MAX_BYTES = int(os.environ.get("IMG_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+IMG_CACHE_MAX_AGE = int(os.environ.get("IMG_CACHE_MAX_AGE", "86400"))
+
+# name -> (width, height, fit); height None keeps the aspect ratio
+TRANSFORM_PRESETS: Dict[str, Tuple[int, Optional[int], str]] = {
+    "thumb": (160, 160, "cover"),
+    "card": (640, 480, "cover"),
+    "tile": (800, 600, "cover"),
+    "catalog": (400, 560, "cover"),
+    "hero": (1920, 800, "cover"),
+    "hero-mobile": (800, 800, "cover"),
+}
+# Free-width resizes (aspect ratio kept) allowed besides the presets
+TRANSFORM_WIDTHS = (320, 640, 800, 1280, 1920)
+
+ALLOWED_SIZES = {(w, h) for w, h, _ in TRANSFORM_PRESETS.values()} | {(w, None) for w in TRANSFORM_WIDTHS}
+FITS = ("cover", "contain")
+FORMATS = tuple(fmt for fmt in ("jpeg", "webp", "png", "avif") if fmt in ("jpeg", "png") or features.check(fmt))
+MEDIA_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp", "png": "image/png", "avif": "image/avif"}
+SOURCE_SUFFIXES = (".jpg", ".jpeg", ".png", ".webp", ".gif", ".tif", ".tiff")
+
+_render_pool = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("IMG_TRANSFORM_WORKERS", str(min(4, os.cpu_count() or 1)))),
+    thread_name_prefix="img-transform",
+)
+
+
+class TransformSpec(NamedTuple):
+    width: int
+    height: Optional[int]
+    fit: str
+    fmt: str
+
+
+def parse_spec(
+    preset: Optional[str],
+    w: Optional[int],
+    h: Optional[int],
+    fit: Optional[str],
+    fmt: Optional[str],
+    accept: Optional[str],
+) -> TransformSpec:
+    """Validate the query against the whitelist; ``fmt=auto`` picks WebP when accepted"""
+    if preset:
+        if preset not in TRANSFORM_PRESETS:
+            raise HTTPException(status_code=400, detail=f"Unknown preset; use one of: {', '.join(TRANSFORM_PRESETS)}")
+        w, h, default_fit = TRANSFORM_PRESETS[preset]
+        fit = fit or default_fit
+    elif w is None:
+        raise HTTPException(status_code=400, detail="Either preset or w is required")
+    if (w, h) not in ALLOWED_SIZES:
+        raise HTTPException(status_code=400, detail="Size is not one of the allowed presets")
+    fit = fit or "contain"
+    if fit not in FITS:
+        raise HTTPException(status_code=400, detail=f"fit must be one of: {', '.join(FITS)}")
+
+    if not fmt or fmt == "auto":
+        fmt = "webp" if "webp" in FORMATS and "image/webp" in (accept or "") else "jpeg"
+    elif fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"fmt must be one of: auto, {', '.join(FORMATS)}")
+    return TransformSpec(w, h, fit, fmt)
+
+
+def resolve_source(path: str) -> Path:
+    """Map a request path to a file inside ``uploads/``; 404 for anything else"""
+    root = UPLOADS_DIR.resolve()
+    source = (root / path).resolve()
+    if root not in source.parents or source.suffix.lower() not in SOURCE_SUFFIXES or not source.is_file():
+        raise HTTPException(status_code=404, detail="Image not found")
+    return source
+
+
+def render(source: Path, spec: TransformSpec) -> bytes:
+    """Decode, orient, resize and encode; never upscales. Blocking."""
+    with Image.open(source) as original:
+        im = normalize_mode(ImageOps.exif_transpose(original))
+
+        src_w, src_h = im.size
+        if spec.height is None:
+            scale = min(1.0, spec.width / src_w)
+            size = (max(1, round(src_w * scale)), max(1, round(src_h * scale)))
+            im = im.resize(size, Image.LANCZOS) if size != im.size else im
+        elif spec.fit == "cover":
+            # Shrink the box instead of upscaling small sources
+            scale = min(1.0, src_w / spec.width, src_h / spec.height)
+            box = (max(1, round(spec.width * scale)), max(1, round(spec.height * scale)))
+            im = ImageOps.fit(im, box, Image.LANCZOS)
+        else:
+            im = im.copy()
+            im.thumbnail((spec.width, spec.height), Image.LANCZOS)
+
+        if spec.fmt == "jpeg":
+            im = flatten_alpha(im)
+
+        out = BytesIO()
+        options = {}
+        if spec.fmt in IMAGE_QUALITY:
+            options["quality"] = IMAGE_QUALITY[spec.fmt]
+        if spec.fmt == "jpeg":
+            options.update(optimize=True, progressive=True)
+        elif spec.fmt == "png":
+            options["optimize"] = True
+        im.save(out, format=spec.fmt.upper(), **options)
+        return out.getvalue()
+
+
+class DiskLRU:
+    """Size-bounded file cache; recency is tracked in memory and seeded from mtimes"""
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        self.loaded = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path(self, name: str) -> Path:
+        return self.directory / name[:2] / name
+
+    def load(self) -> None:
+        """Index existing files, oldest first. Blocking."""
+        if self.loaded:
+            return
+        files = []
+        if self.directory.exists():
+            for path in self.directory.glob("*/*"):
+                if path.name.startswith(".tmp-"):
+                    path.unlink(missing_ok=True)
+                    continue
+                stat = path.stat()
+                files.append((stat.st_mtime, path.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._total += size
+        self.loaded = True
+
+    def get(self, name: str) -> Optional[Path]:
+        """Cached file for ``name``, or None if unknown or deleted since it was indexed"""
+        if name in self._entries:
+            path = self.path(name)
+            if path.is_file():
+                self._entries.move_to_end(name)
+                self.hits += 1
+                return path
+            # Evicted by another worker sharing the directory
+            self._total -= self._entries.pop(name)
+        self.misses += 1
+        return None
+
+    def write(self, name: str, data: bytes) -> Path:
+        """Atomically write a rendered file. Blocking."""
+        path = self.path(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".tmp-{name}")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        return path
+
+    def add(self, name: str, size: int) -> List[Path]:
+        """Record a new entry; returns the files evicted to stay under ``max_bytes``"""
+        if name in self._entries:
+            self._total -= self._entries.pop(name)
+        self._entries[name] = size
+        self._total += size
+        evicted = []
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            old_name, old_size = self._entries.popitem(last=False)
+            self._total -= old_size
+            self.evictions += 1
+            evicted.append(self.path(old_name))
+        return evicted
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+transform_cache = DiskLRU(IMG_CACHE_DIR, IMG_CACHE_MAX_BYTES)
+_inflight: Dict[str, "asyncio.Future[Path]"] = {}
+
+
+def cache_key(source: Path, spec: TransformSpec) -> str:
+    stat = source.stat()
+    raw = f"{source.relative_to(UPLOADS_DIR.resolve())}|{stat.st_mtime_ns}|{stat.st_size}|{spec.width}|{spec.height}|{spec.fit}|{spec.fmt}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest() + "." + IMAGE_EXTENSIONS.get(spec.fmt, spec.fmt)
+
+
+def _render_to_cache(source: Path, spec: TransformSpec, name: str) -> int:
+    data = render(source, spec)
+    transform_cache.write(name, data)
+    return len(data)
+
+
+def _discard(paths: List[Path]) -> None:
+    for path in paths:
+        path.unlink(missing_ok=True)
+
+
+async def get_variant(source: Path, spec: TransformSpec, name: str) -> Path:
+    """Return the cached variant, rendering it once for all concurrent callers"""
+    loop = asyncio.get_running_loop()
+    if not transform_cache.loaded:
+        await loop.run_in_executor(_render_pool, transform_cache.load)
+
+    path = transform_cache.get(name)
+    if path is not None:
+        return path
+
+    pending = _inflight.get(name)
+    if pending is not None:
+        return await asyncio.shield(pending)
+
+    future = loop.create_future()
+    _inflight[name] = future
+    try:
+        size = await loop.run_in_executor(_render_pool, _render_to_cache, source, spec, name)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        error = HTTPException(status_code=415, detail=f"Cannot transform image: {e}")
+        future.set_exception(error)
+        future.exception()
+        raise error
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Mark as retrieved so an unawaited future doesn't log a warning
+        future.exception()
+        raise
+    finally:
+        _inflight.pop(name, None)
+
+    evicted = transform_cache.add(name, size)
+    if evicted:
+        loop.run_in_executor(_render_pool, _discard, evicted)
+    path = transform_cache.path(name)
+    future.set_result(path)
+    return path
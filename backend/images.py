@@ -0,0 +1,166 @@
+"""Upload-time image derivatives with content-addressed storage.
+
+An uploaded image is decoded once, oriented from its EXIF tag and
+re-encoded (without any metadata) at each width in ``IMAGE_WIDTHS`` and each
+format in ``IMAGE_FORMATS``. Everything lands in
+``uploads/images/<content hash>/`` next to a ``manifest.json`` describing the
+variants and ready-made ``srcset`` strings, so re-uploading the same bytes is
+a cache hit. Files Pillow cannot decode (e.g. catalog PDFs) are stored as-is
+under their content hash.
+
+Uploads arrive as spooled temp files (see ``uploads``), so the original is
+never held in memory; Pillow decodes straight from disk.
+"""
+import json
+import os
+import tempfile
+from io import BytesIO
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+from uploads import SpooledUpload, discard, move_into_place
+
+UPLOADS_DIR = Path(__file__).parent / "uploads"
+IMAGES_DIR = UPLOADS_DIR / "images"
+
+IMAGE_WIDTHS = tuple(int(w) for w in os.environ.get("IMAGE_WIDTHS", "320,640,1280").split(","))
+IMAGE_FORMATS = tuple(
+    fmt for fmt in os.environ.get("IMAGE_FORMATS", "webp,jpeg").split(",")
+    if fmt == "jpeg" or features.check(fmt)
+)
+IMAGE_QUALITY = {"jpeg": 82, "webp": 80, "avif": 60}
+IMAGE_EXTENSIONS = {"jpeg": "jpg", "webp": "webp", "avif": "avif"}
+
+# Decompression-bomb guard for uploads
+Image.MAX_IMAGE_PIXELS = int(os.environ.get("IMAGE_MAX_PIXELS", str(80_000_000)))
+
+
+def _atomic_write(dest: Path, data: bytes) -> None:
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=dest.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, dest)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def has_alpha(im: Image.Image) -> bool:
+    return im.mode in ("RGBA", "LA", "PA", "RGBa", "La") or (im.mode == "P" and "transparency" in im.info)
+
+
+def normalize_mode(im: Image.Image) -> Image.Image:
+    """RGB/L as they are, anything with transparency as RGBA, everything else as RGB"""
+    if im.mode in ("RGB", "L", "RGBA"):
+        return im
+    return im.convert("RGBA" if has_alpha(im) else "RGB")
+
+
+def flatten_alpha(im: Image.Image, background=(255, 255, 255)) -> Image.Image:
+    """Composite transparent pixels onto ``background`` for formats without alpha (JPEG)"""
+    if im.mode != "RGBA":
+        return im
+    base = Image.new("RGBA", im.size, background + (255,))
+    return Image.alpha_composite(base, im).convert("RGB")
+
+
+def _encode(im: Image.Image, fmt: str) -> bytes:
+    out = BytesIO()
+    options = {"quality": IMAGE_QUALITY.get(fmt, 80)}
+    if fmt == "jpeg":
+        options.update(optimize=True, progressive=True)
+    elif fmt == "webp":
+        options["method"] = 4
+    im.save(out, format=fmt.upper(), **options)
+    return out.getvalue()
+
+
+def _target_widths(width: int):
+    widths = [w for w in IMAGE_WIDTHS if w < width]
+    # Always provide the largest size the source allows
+    widths.append(min(width, max(IMAGE_WIDTHS)))
+    return sorted(set(widths))
+
+
+def build_derivatives(source, digest: str) -> dict:
+    """Decode ``source`` (bytes or a path) and write every variant; returns the manifest"""
+    target_dir = IMAGES_DIR / digest
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+    with Image.open(source) as source:
+        # Alpha is kept for WebP/AVIF and flattened onto white for JPEG
+        im = normalize_mode(ImageOps.exif_transpose(source))
+        width, height = im.size
+
+        variants = []
+        for target_width in _target_widths(width):
+            target_height = max(1, round(height * target_width / width))
+            resized = im if target_width == width else im.resize((target_width, target_height), Image.LANCZOS)
+            for fmt in IMAGE_FORMATS:
+                name = f"{target_width}.{IMAGE_EXTENSIONS[fmt]}"
+                frame = flatten_alpha(resized) if fmt == "jpeg" else resized
+                _atomic_write(target_dir / name, _encode(frame, fmt))
+                variants.append({
+                    "width": target_width,
+                    "height": target_height,
+                    "format": fmt,
+                    "url": f"/uploads/images/{digest}/{name}",
+                })
+
+    srcset = {
+        fmt: ", ".join(f"{v['url']} {v['width']}w" for v in variants if v["format"] == fmt)
+        for fmt in IMAGE_FORMATS
+    }
+    fallback_format = "jpeg" if "jpeg" in IMAGE_FORMATS else IMAGE_FORMATS[0]
+    src = [v for v in variants if v["format"] == fallback_format][-1]["url"]
+    manifest = {
+        "hash": digest,
+        "width": width,
+        "height": height,
+        "src": src,
+        "srcset": srcset,
+        "variants": variants,
+    }
+    # The manifest is written last: its presence marks a complete set
+    _atomic_write(target_dir / "manifest.json", json.dumps(manifest, indent=2).encode("utf-8"))
+    return manifest
+
+
+def load_manifest(digest: str) -> Optional[dict]:
+    path = IMAGES_DIR / digest / "manifest.json"
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def store_upload(upload: SpooledUpload, filename: Optional[str]) -> dict:
+    """Store a spooled upload; returns ``{"filename", "url", "manifest"}`` with site-relative URLs.
+
+    Consumes the temp file. Blocking (Pillow and file I/O); call through a worker thread.
+    """
+    digest = upload.digest
+    manifest = None
+    if upload.mime.startswith("image/"):
+        manifest = load_manifest(digest)
+        if manifest is None:
+            try:
+                manifest = build_derivatives(upload.path, digest)
+            except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+                manifest = None
+
+    if manifest is not None:
+        discard(upload.path)
+        return {"filename": f"images/{digest}", "url": manifest["src"], "manifest": manifest}
+
+    ext = os.path.splitext(filename or "")[1].lower()
+    name = f"{digest}{ext}"
+    dest = UPLOADS_DIR / name
+    if dest.exists():
+        discard(upload.path)
+    else:
+        move_into_place(upload.path, dest)
+    return {"filename": name, "url": f"/uploads/{name}", "manifest": None}
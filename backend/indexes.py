@@ -0,0 +1,164 @@
+"""Declarative MongoDB index registry.
+
+``INDEXES`` lists every index the routes rely on; ``ensure_indexes`` creates
+the missing ones at startup (existing indexes are matched by name, so it is
+safe to run on every boot). ``QUERY_SHAPES`` mirrors the queries the routes
+issue and is explained after provisioning to warn about any that still
+collection-scan.
+"""
+import logging
+import os
+import time
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+logger = logging.getLogger(__name__)
+
+INDEX_CHECK_QUERIES = os.environ.get("INDEX_CHECK_QUERIES", "1") == "1"
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "products": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Keyset pagination order is (created_at, id) descending
+        IndexModel([("category", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+                   name="category_created_at_id"),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+    ],
+    # Same listing order as products
+    "product_cards": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("category", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+                   name="category_created_at_id"),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        # Spec range filters ($elemMatch over the per-model numeric specs)
+        IndexModel([("category", ASCENDING), ("specs.output_kw_max", ASCENDING), ("specs.output_kw_min", ASCENDING)],
+                   name="category_specs_output"),
+        IndexModel([("specs.output_kw_max", ASCENDING), ("specs.output_kw_min", ASCENDING)], name="specs_output"),
+        IndexModel([("specs.energy_class", ASCENDING)], name="specs_energy_class"),
+        IndexModel([("specs.efficiency_pct", ASCENDING)], name="specs_efficiency"),
+    ],
+    "reviews": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("date", DESCENDING), ("id", DESCENDING)], name="date_id"),
+    ],
+    "categories": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "hero_slides": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("order", ASCENDING)], name="order"),
+    ],
+    "catalogs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("order", ASCENDING)], name="order"),
+    ],
+    "site_settings": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "review_stats": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "admin_users": [
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+    ],
+    "contact_forms": [
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+    ],
+}
+
+# (collection, filter, sort) for the queries issued by routes.py/admin_routes.py
+QUERY_SHAPES = [
+    ("products", {"id": ""}, None),
+    ("products", {"id": {"$in": [""]}}, None),
+    ("products", {"category": ""}, None),
+    ("products", {}, [("created_at", DESCENDING)]),
+    ("products", {"category": ""}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("products", {}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("product_cards", {"id": {"$in": [""]}}, None),
+    ("product_cards", {"category": ""}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("product_cards", {}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("product_cards", {"specs": {"$elemMatch": {"output_kw_max": {"$gte": 0}}}}, None),
+    ("product_cards", {"category": "", "specs": {"$elemMatch": {"output_kw_max": {"$gte": 0}}}}, None),
+    ("product_cards", {"specs": {"$elemMatch": {"energy_class": {"$in": [""]}}}}, None),
+    ("reviews", {"id": ""}, None),
+    ("reviews", {}, [("date", DESCENDING)]),
+    ("reviews", {}, [("date", DESCENDING), ("id", DESCENDING)]),
+    ("categories", {"id": ""}, None),
+    ("hero_slides", {"id": ""}, None),
+    ("hero_slides", {}, [("order", ASCENDING)]),
+    ("catalogs", {"id": ""}, None),
+    ("catalogs", {}, [("order", ASCENDING)]),
+    ("site_settings", {"id": ""}, None),
+    ("review_stats", {"id": ""}, None),
+    ("admin_users", {"username": ""}, None),
+]
+
+# Outcome of the last ensure_indexes run, keyed by "collection.index"
+index_status: Dict[str, str] = {}
+
+
+async def ensure_indexes(db) -> Dict[str, str]:
+    """Create every missing index in ``INDEXES``, logging progress as it goes"""
+    pending = []
+    for collection_name, models in INDEXES.items():
+        try:
+            existing = await db[collection_name].index_information()
+        except Exception as e:
+            logger.warning(f"Could not list indexes on {collection_name}: {e}")
+            continue
+        for model in models:
+            name = model.document["name"]
+            if name in existing:
+                index_status[f"{collection_name}.{name}"] = "exists"
+            else:
+                pending.append((collection_name, model))
+
+    total = len(pending)
+    if total:
+        logger.info(f"Creating {total} missing MongoDB index(es)")
+    for position, (collection_name, model) in enumerate(pending, start=1):
+        name = model.document["name"]
+        key = f"{collection_name}.{name}"
+        started = time.monotonic()
+        try:
+            await db[collection_name].create_indexes([model])
+            index_status[key] = "created"
+            elapsed = (time.monotonic() - started) * 1000
+            logger.info(f"[{position}/{total}] Created index {key} in {elapsed:.0f} ms")
+        except Exception as e:
+            index_status[key] = f"failed: {e}"
+            logger.warning(f"[{position}/{total}] Could not create index {key}: {e}")
+
+    if INDEX_CHECK_QUERIES:
+        await check_query_plans(db)
+    return index_status
+
+
+def _plan_stages(plan: dict):
+    yield plan.get("stage")
+    for child_key in ("inputStage", "queryPlan"):
+        if isinstance(plan.get(child_key), dict):
+            yield from _plan_stages(plan[child_key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+
+async def check_query_plans(db) -> List[str]:
+    """Explain each entry of ``QUERY_SHAPES`` and warn on COLLSCAN plans"""
+    collscans = []
+    for collection_name, query, sort in QUERY_SHAPES:
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        try:
+            explain = await cursor.explain()
+        except Exception as e:
+            logger.debug(f"Could not explain {collection_name} {query}: {e}")
+            continue
+        winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+        if "COLLSCAN" in _plan_stages(winning_plan):
+            description = f"{collection_name} filter={query} sort={sort}"
+            collscans.append(description)
+            logger.warning(f"Query falls back to COLLSCAN: {description}")
+    return collscans
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime, timezone
 import uuid
 
@@ -52,6 +52,8 @@ class ProductModel(BaseModel):
     technical_specs: TechnicalSpec
     components: ComponentsUsed
 
+LANGUAGES = ("tr", "en", "ru", "it")
+
 class MultiLangText(BaseModel):
     """Multi-language text support"""
     tr: str = ""
@@ -89,11 +91,50 @@ class Product(ProductBase):
 class ProductCreate(ProductBase):
     pass
 
+class ProductPage(BaseModel):
+    """One keyset-paginated page of products"""
+    items: List[Product]
+    total: int
+    has_more: bool
+    next_cursor: Optional[str] = None
+
+class ModelSpecs(BaseModel):
+    """A ProductModel's specs parsed to canonical units (see specs.py)"""
+    model_name: str = ""
+    output_kw_min: Optional[float] = None
+    output_kw_max: Optional[float] = None
+    efficiency_pct: Optional[float] = None
+    energy_class: Optional[str] = None
+    hot_water_flow_lpm: Optional[float] = None
+    weight_kg: Optional[float] = None
+    dimensions_mm: Optional[List[float]] = None
+
+class ProductCard(BaseModel):
+    """Denormalized product summary for listings (see product_cards.py)"""
+    id: str
+    name: MultiLangText | str
+    category: str
+    cover: Optional[str] = None
+    output_min: Optional[float] = None  # kW, across all models
+    output_max: Optional[float] = None
+    energy_class: Optional[str] = None  # best class across models
+    model_count: int = 0
+    specs: List[ModelSpecs] = []
+    created_at: Optional[datetime] = None
+
+class ProductCardPage(BaseModel):
+    """One keyset-paginated page of product cards"""
+    items: List[ProductCard]
+    total: int
+    has_more: bool
+    next_cursor: Optional[str] = None
+
 class ReviewBase(BaseModel):
     name: str
     city: str
     rating: int = Field(ge=1, le=5)
     text: str
+    product_id: Optional[str] = None
 
 class Review(ReviewBase):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -102,6 +143,29 @@ class Review(ReviewBase):
 class ReviewCreate(ReviewBase):
     pass
 
+class ReviewPage(BaseModel):
+    """One keyset-paginated page of reviews"""
+    items: List[Review]
+    total: int
+    has_more: bool
+    next_cursor: Optional[str] = None
+
+class RatingSummary(BaseModel):
+    """Review count, average and 1-5 star histogram"""
+    count: int = 0
+    average: Optional[float] = None
+    distribution: Dict[str, int] = Field(default_factory=lambda: {str(r): 0 for r in range(1, 6)})
+
+class CityRatingSummary(RatingSummary):
+    city: str
+
+class ProductRatingSummary(RatingSummary):
+    product_id: str
+
+class ReviewSummary(RatingSummary):
+    cities: List[CityRatingSummary] = []
+    products: List[ProductRatingSummary] = []
+
 class CategoryBase(BaseModel):
     id: str
     name: str
@@ -0,0 +1,86 @@
+"""Keyset (cursor) pagination over an indexed ``(sort_key, id)`` order.
+
+Cursors are opaque url-safe tokens holding the sort key and id of the last
+item on the previous page, so fetching the next page is an index seek rather
+than a ``skip()``. Pages are always ordered descending.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional, Tuple
+
+from fastapi import HTTPException
+from pymongo import DESCENDING
+
+
+def encode_cursor(sort_value: Any, item_id: str) -> str:
+    if isinstance(sort_value, datetime):
+        value = {"dt": sort_value.isoformat()}
+    else:
+        value = {"v": sort_value}
+    raw = json.dumps({"k": value, "id": item_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        value = data["k"]
+        sort_value = datetime.fromisoformat(value["dt"]) if "dt" in value else value["v"]
+        return sort_value, str(data["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def after_cursor(sort_key: str, cursor: str) -> dict:
+    """Filter matching the items that follow ``cursor`` in descending order"""
+    sort_value, last_id = decode_cursor(cursor)
+    if sort_value is None:
+        # Missing keys sort last; only ids break the tie among them
+        return {sort_key: None, "id": {"$lt": last_id}}
+    return {"$or": [
+        {sort_key: {"$lt": sort_value}},
+        {sort_key: sort_value, "id": {"$lt": last_id}},
+        {sort_key: None},
+    ]}
+
+
+async def fetch_page(
+    collection,
+    query: dict,
+    sort_key: str,
+    limit: int,
+    after: Optional[dict] = None,
+    projection: Optional[dict] = None,
+) -> dict:
+    """Return ``{"items", "total", "has_more", "next_cursor"}`` for one page.
+
+    ``after`` is the filter from ``after_cursor``; decode the cursor before
+    loading so a malformed token surfaces as a 400 rather than a DB fallback.
+    """
+    # The next cursor needs the sort key even when the client didn't ask for it
+    if projection and sort_key not in projection and any(v != 0 for v in projection.values()):
+        projection = {**projection, sort_key: 1}
+
+    page_query = query
+    if after:
+        page_query = {"$and": [query, after]} if query else after
+
+    docs = await collection.find(page_query, projection).sort(
+        [(sort_key, DESCENDING), ("id", DESCENDING)]
+    ).limit(limit + 1).to_list(length=limit + 1)
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+
+    next_cursor = None
+    if has_more and docs:
+        last = docs[-1]
+        next_cursor = encode_cursor(last.get(sort_key), last["id"])
+
+    return {
+        "items": docs,
+        "total": await collection.count_documents(query),
+        "has_more": has_more,
+        "next_cursor": next_cursor,
+    }
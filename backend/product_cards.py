@@ -0,0 +1,108 @@
+"""``product_cards``: a denormalized read model for product listings.
+
+A card is the few hundred bytes a listing needs (names, category, cover
+image, output range and best energy class across models, plus each model's
+numeric specs from ``specs.model_specs`` for filtering) derived once from
+the full product document. Cards are upserted whenever a product is written
+and can be rebuilt from ``products`` at any time:
+
+    python product_cards.py
+"""
+import asyncio
+import logging
+from typing import List
+
+from pymongo import UpdateOne
+
+from specs import energy_class_rank, model_specs
+
+logger = logging.getLogger(__name__)
+
+CARD_REBUILD_BATCH_SIZE = 500
+
+# Only what build_card reads
+PRODUCT_CARD_SOURCE_FIELDS = {
+    "_id": 0, "id": 1, "name": 1, "category": 1, "images": 1, "image": 1, "created_at": 1,
+    "models.model_name": 1, "models.technical_specs": 1,
+}
+
+
+def build_card(product: dict) -> dict:
+    specs = [model_specs(model) for model in product.get("models") or []]
+    minimums = [m["output_kw_min"] for m in specs if m["output_kw_min"] is not None]
+    maximums = [m["output_kw_max"] for m in specs if m["output_kw_max"] is not None]
+    classes = [m["energy_class"] for m in specs if m["energy_class"]]
+    images = product.get("images") or []
+    return {
+        "id": product["id"],
+        "name": product.get("name", ""),
+        "category": product.get("category", ""),
+        "cover": images[0] if images else product.get("image"),
+        "output_min": min(minimums) if minimums else None,
+        "output_max": max(maximums) if maximums else None,
+        "energy_class": min(classes, key=energy_class_rank) if classes else None,
+        "model_count": len(specs),
+        "specs": specs,
+        "created_at": product.get("created_at"),
+    }
+
+
+def card_upsert(product: dict) -> UpdateOne:
+    return UpdateOne({"id": product["id"]}, {"$set": build_card(product)}, upsert=True)
+
+
+async def upsert_card(db, product: dict) -> None:
+    """Refresh one card after a product write; failures only cost freshness"""
+    try:
+        await db.product_cards.update_one({"id": product["id"]}, {"$set": build_card(product)}, upsert=True)
+    except Exception as e:
+        logger.warning(f"Could not update product card {product.get('id')}: {e}")
+
+
+async def upsert_cards(db, product_ids: List[str]) -> None:
+    """Refresh the cards for ``product_ids`` (e.g. after a bulk import batch)"""
+    if not product_ids:
+        return
+    products = await db.products.find({"id": {"$in": product_ids}}, PRODUCT_CARD_SOURCE_FIELDS).to_list(length=None)
+    if products:
+        await db.product_cards.bulk_write([card_upsert(p) for p in products], ordered=False)
+
+
+async def rebuild_cards(db) -> int:
+    """Rebuild every card from ``products`` and drop cards of deleted products"""
+    seen = []
+    batch = []
+    cursor = db.products.find({}, PRODUCT_CARD_SOURCE_FIELDS).batch_size(CARD_REBUILD_BATCH_SIZE)
+    async for product in cursor:
+        seen.append(product["id"])
+        batch.append(card_upsert(product))
+        if len(batch) >= CARD_REBUILD_BATCH_SIZE:
+            await db.product_cards.bulk_write(batch, ordered=False)
+            batch = []
+    if batch:
+        await db.product_cards.bulk_write(batch, ordered=False)
+    await db.product_cards.delete_many({"id": {"$nin": seen}})
+    logger.info(f"Rebuilt {len(seen)} product cards")
+    return len(seen)
+
+
+async def ensure_cards(db) -> None:
+    """Build the read model on first boot (or after it was dropped)"""
+    try:
+        if await db.product_cards.estimated_document_count() == 0 and await db.products.estimated_document_count() > 0:
+            await rebuild_cards(db)
+    except Exception as e:
+        logger.warning(f"Skipping product card build: {e}")
+
+
+if __name__ == "__main__":
+    import database
+
+    async def main():
+        try:
+            count = await rebuild_cards(database.db)
+            print(f"Rebuilt {count} product cards")
+        finally:
+            database.close()
+
+    asyncio.run(main())
@@ -0,0 +1,73 @@
+"""Sparse product responses: ``fields=`` / ``lang=`` turned into a Mongo projection.
+
+The projection is applied by the database, so unrequested sub-documents
+(``models`` with their specs and components, other languages) never leave
+MongoDB. Sparse documents are returned as-is rather than through ``Product``,
+which would require every field and validate every nested model.
+"""
+from typing import List, Optional
+
+from fastapi import HTTPException
+
+from i18n import fallback_chain
+
+# Top-level fields plus the ProductModel sub-paths clients may select.
+# "cover" selects only the first entry of ``images``.
+PRODUCT_FIELDS = (
+    "id", "name", "category", "images", "cover", "description", "models",
+    "models.model_name", "models.technical_specs", "models.components",
+    "price", "image", "created_at",
+)
+
+# MultiLangText | str fields narrowed by ``lang``
+LOCALIZED_PRODUCT_FIELDS = ("name", "description")
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    if not fields:
+        return []
+    selected = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in selected if f not in PRODUCT_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return selected
+
+
+def localized(field: str, lang: str) -> dict:
+    """Projection expression resolving ``field`` to one translation in MongoDB.
+
+    Walks the same chain as i18n.resolve_text, so list and detail responses
+    agree, and only the chosen translation leaves the database. Legacy plain
+    strings pass through.
+    """
+    resolved = ""
+    for code in reversed(fallback_chain(lang)):
+        path = f"${field}.{code}"
+        present = {"$and": [{"$eq": [{"$type": path}, "string"]}, {"$ne": [path, ""]}]}
+        resolved = {"$cond": [present, path, resolved]}
+    return {"$cond": [{"$eq": [{"$type": f"${field}"}, "object"]}, resolved, f"${field}"]}
+
+
+def product_projection(fields: Optional[str], lang: Optional[str]) -> Optional[dict]:
+    """Build the projection for ``fields`` and a resolved ``lang``, or None for full documents"""
+    selected = parse_fields(fields)
+    if not selected and not lang:
+        return None
+    if not selected:
+        selected = [f for f in PRODUCT_FIELDS if f != "cover" and not f.startswith("models.")]
+
+    # Parent paths win over their children to avoid projection path collisions
+    if "models" in selected:
+        selected = [f for f in selected if not f.startswith("models.")]
+    if "images" in selected and "cover" in selected:
+        selected.remove("cover")
+
+    projection = {"_id": 0, "id": 1}
+    for field in selected:
+        if field == "cover":
+            projection["images"] = {"$slice": 1}
+        elif lang and field in LOCALIZED_PRODUCT_FIELDS:
+            projection[field] = localized(field, lang)
+        else:
+            projection[field] = 1
+    return projection
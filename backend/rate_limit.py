@@ -0,0 +1,134 @@
+"""Token-bucket rate limiting for expensive or write-heavy routes.
+
+Each matching ``RateLimitRule`` keeps one bucket per client IP (or one per
+route when ``per_ip`` is False, e.g. a global cap on concurrent bcrypt
+work). A bucket holds up to ``burst`` tokens, refills at ``rate`` per
+second and costs one token per request; an empty bucket answers ``429``
+with ``Retry-After``. Requests matching no rule pass straight through.
+
+Buckets live in process (``MemoryBackend``) by default, so each worker
+enforces its own limits. A shared store (e.g. Redis) plugs in by passing
+any object with the same ``take`` coroutine to ``RateLimitMiddleware``.
+"""
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from fast_json import dumps
+
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "1") == "1"
+# Behind a reverse proxy the peer is the proxy; trust its X-Forwarded-For
+RATE_LIMIT_TRUST_PROXY = os.environ.get("RATE_LIMIT_TRUST_PROXY", "0") == "1"
+# Trusted proxies in front of the app; each appends the peer it saw, so the
+# client is this many entries from the right (anything further left is
+# whatever the client sent)
+RATE_LIMIT_PROXY_HOPS = int(os.environ.get("RATE_LIMIT_PROXY_HOPS", "1"))
+RATE_LIMIT_MAX_KEYS = int(os.environ.get("RATE_LIMIT_MAX_KEYS", "100000"))
+
+
+class RateLimitRule(NamedTuple):
+    name: str
+    method: str
+    path: str  # prefix
+    rate: float  # tokens per second
+    burst: int
+    per_ip: bool = True
+
+
+# Every matching rule is checked, in order
+RATE_LIMIT_RULES: Tuple[RateLimitRule, ...] = (
+    # Each attempt is a bcrypt verify: a few per minute per IP, and a global
+    # ceiling so a distributed burst can't pin the hash pool either
+    RateLimitRule("login", "POST", "/api/admin/login", rate=5 / 60, burst=5),
+    RateLimitRule("login-global", "POST", "/api/admin/login", rate=5, burst=20, per_ip=False),
+    RateLimitRule("contact", "POST", "/api/contact", rate=3 / 60, burst=5),
+    RateLimitRule("reviews", "POST", "/api/reviews", rate=2 / 60, burst=3),
+)
+
+
+class MemoryBackend:
+    """In-process buckets: ``key -> (tokens, updated_at)``, least recently used evicted first"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, rule: RateLimitRule, now: float) -> float:
+        """Spend one token; returns 0 when allowed, otherwise seconds until one is available"""
+        tokens, updated = self._buckets.get(key, (rule.burst, now))
+        tokens = min(rule.burst, tokens + (now - updated) * rule.rate)
+        if tokens >= 1:
+            self._buckets[key] = (tokens - 1, now)
+            wait = 0.0
+        else:
+            self._buckets[key] = (tokens, now)
+            wait = (1 - tokens) / rule.rate
+        self._buckets.move_to_end(key)
+        # An evicted bucket comes back full, which only errs towards allowing
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+def client_ip(scope: Scope) -> str:
+    if RATE_LIMIT_TRUST_PROXY:
+        forwarded = [
+            entry.strip()
+            for name, value in scope.get("headers", ())
+            if name == b"x-forwarded-for"
+            for entry in value.decode("latin-1").split(",")
+            if entry.strip()
+        ]
+        if len(forwarded) >= RATE_LIMIT_PROXY_HOPS > 0:
+            return forwarded[-RATE_LIMIT_PROXY_HOPS]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class RateLimitMiddleware:
+    def __init__(self, app: ASGIApp, backend=None, rules: Tuple[RateLimitRule, ...] = RATE_LIMIT_RULES):
+        self.app = app
+        self.backend = backend or MemoryBackend()
+        self.rules = rules
+
+    def matching(self, method: str, path: str):
+        return [rule for rule in self.rules if rule.method == method and path.startswith(rule.path)]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        rules = self.matching(scope["method"], scope["path"])
+        if rules:
+            wait = await self.check(scope, rules)
+            if wait is not None:
+                await self.reject(send, wait)
+                return
+        await self.app(scope, receive, send)
+
+    async def check(self, scope: Scope, rules) -> Optional[float]:
+        now = time.monotonic()
+        ip = client_ip(scope)
+        for rule in rules:
+            key = f"{rule.name}:{ip}" if rule.per_ip else rule.name
+            wait = await self.backend.take(key, rule, now)
+            if wait > 0:
+                return wait
+        return None
+
+    async def reject(self, send: Send, wait: float) -> None:
+        body = dumps({"detail": "Too many requests"})
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(wait))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,172 @@
+"""``review_stats``: incrementally maintained review aggregates.
+
+One counter document for all reviews (``id: "all"``), one per city
+(``id: "city:<normalized name>"``) and one per reviewed product
+(``id: "product:<product id>"``), each holding ``count``, ``sum`` and a
+1-5 ``ratings`` histogram. Review writes ``$inc`` the affected counters, so
+``/api/reviews/summary`` reads a handful of small documents instead of
+scanning every review. The counters can be rebuilt from ``reviews`` at any
+time:
+
+    python review_stats.py
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from models import CityRatingSummary, ProductRatingSummary, ReviewSummary
+from search import fold
+
+logger = logging.getLogger(__name__)
+
+ALL_KEY = "all"
+RATINGS = [str(rating) for rating in range(1, 6)]
+
+
+CITY_PREFIX = "city:"
+PRODUCT_PREFIX = "product:"
+
+
+def city_key(city: str) -> str:
+    # Folded as in search (İ/I/ı -> i, accents stripped), so "İzmir" and "izmir" share a counter
+    return CITY_PREFIX + " ".join(fold(city or "").split())
+
+
+def product_key(product_id: str) -> str:
+    return PRODUCT_PREFIX + product_id
+
+
+def _increment(key: str, rating: int, delta: int, fields: Optional[dict] = None) -> UpdateOne:
+    update = {"$inc": {"count": delta, "sum": rating * delta, f"ratings.{rating}": delta}}
+    if fields and delta > 0:
+        # Latest added spelling wins for display
+        update["$set"] = fields
+    return UpdateOne({"id": key}, update, upsert=True)
+
+
+def _changes(review: dict, delta: int) -> List[UpdateOne]:
+    rating = int(review["rating"])
+    city = review.get("city") or ""
+    changes = [
+        _increment(ALL_KEY, rating, delta),
+        _increment(city_key(city), rating, delta, {"city": " ".join(city.split())}),
+    ]
+    if review.get("product_id"):
+        changes.append(_increment(product_key(review["product_id"]), rating, delta, {"product_id": review["product_id"]}))
+    return changes
+
+
+async def _apply(db, operations: List[UpdateOne]) -> None:
+    """Counters only cost accuracy if this fails; a rebuild repairs them"""
+    if not operations:
+        return
+    try:
+        await db.review_stats.bulk_write(operations, ordered=False)
+    except Exception as e:
+        logger.warning(f"Could not update review stats: {e}")
+
+
+async def reviews_created(db, reviews: List[dict]) -> None:
+    await _apply(db, [op for review in reviews for op in _changes(review, 1)])
+
+
+async def review_updated(db, before: dict, after: dict) -> None:
+    if (
+        int(before["rating"]) == int(after["rating"])
+        and city_key(before.get("city")) == city_key(after.get("city"))
+        and before.get("product_id") == after.get("product_id")
+    ):
+        return
+    await _apply(db, _changes(before, -1) + _changes(after, 1))
+
+
+async def review_deleted(db, review: dict) -> None:
+    await _apply(db, _changes(review, -1))
+
+
+def _summary(doc: Optional[dict]) -> dict:
+    doc = doc or {}
+    count = doc.get("count", 0)
+    ratings = doc.get("ratings") or {}
+    return {
+        "count": count,
+        "average": round(doc.get("sum", 0) / count, 2) if count > 0 else None,
+        "distribution": {rating: ratings.get(rating, 0) for rating in RATINGS},
+    }
+
+
+async def load_summary(db) -> ReviewSummary:
+    docs = await db.review_stats.find({}, {"_id": 0}).to_list(length=None)
+    overall = next((doc for doc in docs if doc["id"] == ALL_KEY), None)
+    counted = [doc for doc in docs if doc.get("count", 0) > 0]
+    cities = [
+        CityRatingSummary(city=doc.get("city", ""), **_summary(doc))
+        for doc in counted
+        if doc["id"].startswith(CITY_PREFIX)
+    ]
+    cities.sort(key=lambda city: (-city.count, city.city))
+    products = [
+        ProductRatingSummary(product_id=doc["product_id"], **_summary(doc))
+        for doc in counted
+        if doc["id"].startswith(PRODUCT_PREFIX)
+    ]
+    products.sort(key=lambda product: (-product.count, product.product_id))
+    return ReviewSummary(cities=cities, products=products, **_summary(overall))
+
+
+async def rebuild_review_stats(db) -> int:
+    """Recount every counter from ``reviews`` with one aggregation and drop stale ones"""
+    pipeline = [{"$group": {
+        "_id": {"city": "$city", "product_id": "$product_id", "rating": "$rating"},
+        "count": {"$sum": 1},
+    }}]
+
+    def empty(**fields):
+        return {"count": 0, "sum": 0, "ratings": {rating: 0 for rating in RATINGS}, **fields}
+
+    counters: Dict[str, dict] = {ALL_KEY: empty()}
+    async for group in db.reviews.aggregate(pipeline):
+        city = " ".join((group["_id"].get("city") or "").split())
+        product_id = group["_id"].get("product_id")
+        rating, count = int(group["_id"]["rating"]), group["count"]
+        # Spellings differing only in case/accents/spacing share one counter, as in city_key
+        keys = {ALL_KEY: {}, city_key(city): {"city": city}}
+        if product_id:
+            keys[product_key(product_id)] = {"product_id": product_id}
+        for key, fields in keys.items():
+            counter = counters.setdefault(key, empty(**fields))
+            counter["count"] += count
+            counter["sum"] += rating * count
+            counter["ratings"][str(rating)] += count
+    operations = [
+        UpdateOne({"id": key}, {"$set": {"id": key, **counter}}, upsert=True)
+        for key, counter in counters.items()
+    ]
+    await db.review_stats.bulk_write(operations, ordered=False)
+    await db.review_stats.delete_many({"id": {"$nin": list(counters)}})
+    logger.info(f"Rebuilt review stats for {counters[ALL_KEY]['count']} reviews")
+    return counters[ALL_KEY]["count"]
+
+
+async def ensure_review_stats(db) -> None:
+    """Build the counters on first boot (or after they were dropped)"""
+    try:
+        if await db.review_stats.estimated_document_count() == 0 and await db.reviews.estimated_document_count() > 0:
+            await rebuild_review_stats(db)
+    except Exception as e:
+        logger.warning(f"Skipping review stats build: {e}")
+
+
+if __name__ == "__main__":
+    import database
+
+    async def main():
+        try:
+            count = await rebuild_review_stats(database.db)
+            print(f"Rebuilt review stats for {count} reviews")
+        finally:
+            database.close()
+
+    asyncio.run(main())
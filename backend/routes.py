@@ -1,26 +1,105 @@
-from fastapi import APIRouter, HTTPException, Query
-from typing import List, Optional
-from models import Product, ProductCreate, Review, ReviewCreate, Category, ContactForm, HeroSlide
-from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from typing import List, Optional, Union
+from models import Product, ProductCard, ProductCardPage, ProductCreate, ProductPage, Review, ReviewCreate, ReviewPage, ReviewSummary, Category, ContactForm, HeroSlide
+from cache import catalog_cache
+from http_cache import cached_json, etag_matches
+from search import search_index
+from pagination import after_cursor, fetch_page
+from projection import product_projection
+from i18n import localize, localized_response, resolve_lang
+from fast_json import model_response
+from product_cards import upsert_card
+from specs import facet_pipeline, shape_facets, spec_filter
+from compare import COMPARE_PROJECTION, build_matrix, parse_ids
+from write_behind import write_queue
+from review_stats import load_summary, reviews_created
+from export import EXPORT_BATCH_SIZE, csv_chunks, ndjson_chunks
+from image_transforms import IMG_CACHE_MAX_AGE, MEDIA_TYPES, cache_key, get_variant, parse_spec, resolve_source
 import os
 
 router = APIRouter(prefix="/api")
 
-# Get MongoDB client from main server
-from server import db
+# Shared MongoDB client
+from database import db
 
 # Products endpoints
-@router.get("/products", response_model=List[Product])
+@router.get(
+    "/products",
+    response_model=Union[List[Product], ProductPage, List[ProductCard], ProductCardPage],
+)
 async def get_products(
+    request: Request,
     category: Optional[str] = None,
-    limit: int = Query(default=50, le=100)
+    limit: int = Query(default=50, le=100),
+    cursor: Optional[str] = None,
+    paginate: bool = False,
+    fields: Optional[str] = None,
+    view: str = Query(default="full", pattern="^(full|card)$"),
+    output_kw_min: Optional[float] = None,
+    output_kw_max: Optional[float] = None,
+    efficiency_min: Optional[float] = None,
+    hot_water_flow_min: Optional[float] = None,
+    energy_class: Optional[str] = None,
+    lang: Optional[str] = Depends(resolve_lang),
 ):
     query = {}
     if category:
         query['category'] = category
+    spec_query = spec_filter(output_kw_min, output_kw_max, efficiency_min, hot_water_flow_min, energy_class)
+    if spec_query:
+        query.update(spec_query)
+
+    if view == "card":
+        if fields:
+            raise HTTPException(status_code=400, detail="fields cannot be combined with view=card")
+        # Precomputed summaries from the product_cards read model
+        projection = {"_id": 0}
+    else:
+        # Sparse mode: project in Mongo and skip Product validation entirely
+        projection = product_projection(fields, lang)
+    # Spec filters run against the indexed numeric specs on product cards;
+    # full products are then loaded by id in card order
+    load_by_id = spec_query is not None and view != "card"
+    source = db.product_cards if view == "card" or spec_query else db.products
+    source_projection = {"_id": 0, "id": 1, "created_at": 1} if load_by_id else projection
+    params = {
+        "category": category, "limit": limit, "fields": fields, "view": view,
+        "output_kw_min": output_kw_min, "output_kw_max": output_kw_max, "efficiency_min": efficiency_min,
+        "hot_water_flow_min": hot_water_flow_min, "energy_class": energy_class,
+    }
+
+    def build(products):
+        return products if projection else [Product(**product) for product in products]
+
+    async def resolve(items):
+        if not load_by_id:
+            return build(items)
+        ids = [item["id"] for item in items]
+        products = await db.products.find({"id": {"$in": ids}}, projection).to_list(length=len(ids))
+        by_id = {product["id"]: product for product in products}
+        return build([by_id[product_id] for product_id in ids if product_id in by_id])
+
+    # Keyset pagination: newest first, envelope with total/has_more/next_cursor
+    if paginate or cursor:
+        after = after_cursor("created_at", cursor) if cursor else None
+
+        async def load_page():
+            page = await fetch_page(source, query, "created_at", limit, after, source_projection)
+            page["items"] = await resolve(page["items"])
+            return page if projection else ProductPage(**page)
+
+        try:
+            return await cached_json(request, "products", {**params, "cursor": cursor, "paginate": True}, load_page, lang)
+        except Exception:
+            return ProductPage(items=[], total=0, has_more=False)
+
+    async def load():
+        items = await source.find(query, source_projection).limit(limit).to_list(length=limit)
+        return await resolve(items)
+
     try:
-        products = await db.products.find(query).limit(limit).to_list(length=limit)
-        return [Product(**product) for product in products]
+        return await cached_json(request, "products", params, load, lang)
     except Exception:
         # Graceful fallback with sample data when DB is unavailable
         sample_products = [
@@ -28,7 +107,7 @@ async def get_products(
                 name={"tr": "Kombi Cihazı X", "en": "Combi Unit X", "ru": "Комби X", "it": "Caldaia X"},
                 category="combi",
                 images=[
-                    "https://images.unsplash.com/photo-1582719478250-c89cae4dc85b?w=800&auto=format&fit=crop"
+                    "/api/img/kombi/hermetik-klasik-tip/img-1.jpg?preset=tile"
                 ],
                 description={"tr": "Yüksek verimli kombi cihazı.", "en": "High-efficiency combi unit.", "ru": "Высокоэффективный комбинированный агрегат.", "it": "Caldaia ad alta efficienza."},
                 models=[],
@@ -37,23 +116,90 @@ async def get_products(
                 name={"tr": "Yoğuşmalı Cihaz Y", "en": "Condensing Unit Y", "ru": "Конденсационный блок Y", "it": "Caldaia a condensazione Y"},
                 category="condensing",
                 images=[
-                    "https://images.unsplash.com/photo-1544996901-842263cf165b?w=800&auto=format&fit=crop"
+                    "/api/img/kombi/tam-yogusmali-premix-tip/img-1.jpg?preset=tile"
                 ],
                 description={"tr": "Sessiz ve tasarruflu.", "en": "Quiet and economical.", "ru": "Тихий и экономичный.", "it": "Silenziosa ed economica."},
                 models=[],
             ),
         ]
-        return sample_products[:limit]
+        return localized_response(sample_products[:limit], lang)
+
+@router.get("/products/facets")
+async def get_product_facets(
+    request: Request,
+    category: Optional[str] = None,
+    output_kw_min: Optional[float] = None,
+    output_kw_max: Optional[float] = None,
+    efficiency_min: Optional[float] = None,
+    hot_water_flow_min: Optional[float] = None,
+    energy_class: Optional[str] = None,
+):
+    """Counts per category, energy class and output band for the current filters"""
+    spec_query = spec_filter(output_kw_min, output_kw_max, efficiency_min, hot_water_flow_min, energy_class)
+    params = {
+        "facets": True, "category": category,
+        "output_kw_min": output_kw_min, "output_kw_max": output_kw_max, "efficiency_min": efficiency_min,
+        "hot_water_flow_min": hot_water_flow_min, "energy_class": energy_class,
+    }
+
+    async def load():
+        result = await db.product_cards.aggregate(facet_pipeline(category, spec_query)).to_list(length=1)
+        return shape_facets(result[0] if result else None)
 
-@router.get("/products/{product_id}", response_model=Product)
-async def get_product(product_id: str):
     try:
+        return await cached_json(request, "products", params, load)
+    except Exception:
+        return shape_facets(None)
+
+@router.get("/products/export")
+async def export_products(
+    format: str = Query(default="ndjson", pattern="^(ndjson|csv)$"),
+    category: Optional[str] = None,
+):
+    query = {}
+    if category:
+        query['category'] = category
+
+    cursor = db.products.find(query, {"_id": 0}).sort("id", 1).batch_size(EXPORT_BATCH_SIZE)
+    products = cursor.__aiter__()
+    # Pull the first document up front so an unavailable DB is a 503, not an empty 200
+    try:
+        first = await anext(products, None)
+    except Exception:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+
+    async def documents():
+        if first is None:
+            return
+        yield first
+        async for product in products:
+            yield product
+
+    if format == "csv":
+        return StreamingResponse(
+            csv_chunks(documents()),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": 'attachment; filename="products.csv"'},
+        )
+    return StreamingResponse(
+        ndjson_chunks(documents()),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="products.ndjson"'},
+    )
+
+@router.get("/products/{product_id}", response_model=Product)
+async def get_product(request: Request, product_id: str, lang: Optional[str] = Depends(resolve_lang)):
+    async def load():
         product = await db.products.find_one({"id": product_id})
+        return Product(**product) if product else None
+
+    try:
+        response = await cached_json(request, "products", {"id": product_id}, load, lang)
     except Exception:
-        product = None
-    if not product:
+        response = None
+    if response is None:
         raise HTTPException(status_code=404, detail="Product not found")
-    return Product(**product)
+    return response
 
 @router.post("/products", response_model=Product)
 async def create_product(product: ProductCreate):
@@ -64,33 +210,102 @@ async def create_product(product: ProductCreate):
     except Exception:
         # If DB is unavailable, indicate service issue
         raise HTTPException(status_code=503, detail="Database unavailable")
-    return product_obj
+    await upsert_card(db, product_obj.dict())
+    catalog_cache.invalidate("products")
+    search_index.add(product_obj.dict())
+    return model_response(product_obj)
+
+# Comparison endpoint
+@router.get("/compare")
+async def compare_products(request: Request, ids: str, lang: Optional[str] = Depends(resolve_lang)):
+    """Column-aligned spec matrix for the given products, one column per model"""
+    product_ids = parse_ids(ids)
+
+    async def load():
+        products = await db.products.find({"id": {"$in": product_ids}}, COMPARE_PROJECTION).to_list(length=len(product_ids))
+        return build_matrix(products, product_ids) if products else None
 
-# Reviews endpoints
-@router.get("/reviews", response_model=List[Review])
-async def get_reviews(limit: int = Query(default=20, le=100)):
     try:
+        response = await cached_json(request, "products", {"compare": ",".join(product_ids)}, load, lang)
+    except Exception:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    if response is None:
+        raise HTTPException(status_code=404, detail="Products not found")
+    return response
+
+# Reviews endpoints
+@router.get("/reviews", response_model=Union[List[Review], ReviewPage])
+async def get_reviews(
+    request: Request,
+    limit: int = Query(default=20, le=100),
+    cursor: Optional[str] = None,
+    paginate: bool = False,
+):
+    if paginate or cursor:
+        after = after_cursor("date", cursor) if cursor else None
+
+        async def load_page():
+            page = await fetch_page(db.reviews, {}, "date", limit, after)
+            page["items"] = [Review(**review) for review in page["items"]]
+            return ReviewPage(**page)
+
+        params = {"limit": limit, "cursor": cursor, "paginate": True}
+        try:
+            return await cached_json(request, "reviews", params, load_page)
+        except Exception:
+            return ReviewPage(items=[], total=0, has_more=False)
+
+    async def load():
         reviews = await db.reviews.find().sort("date", -1).limit(limit).to_list(length=limit)
         return [Review(**review) for review in reviews]
+
+    try:
+        return await cached_json(request, "reviews", {"limit": limit}, load)
     except Exception:
         return []
 
+async def _reviews_written(reviews: List[dict]):
+    await reviews_created(db, reviews)
+    catalog_cache.invalidate("reviews")
+
+write_queue.subscribe("reviews", _reviews_written)
+
+@router.get("/reviews/summary", response_model=ReviewSummary)
+async def get_review_summary(request: Request):
+    """Average rating and histogram, overall, per city and per product, from the precomputed counters"""
+    async def load():
+        return await load_summary(db)
+
+    try:
+        return await cached_json(request, "reviews", {"summary": True}, load)
+    except Exception:
+        return ReviewSummary()
+
 @router.post("/reviews", response_model=Review)
 async def create_review(review: ReviewCreate):
+    if review.product_id:
+        try:
+            exists = await db.products.count_documents({"id": review.product_id}, limit=1)
+        except Exception:
+            # Database offline: the review is journaled anyway, accept it
+            exists = True
+        if not exists:
+            raise HTTPException(status_code=404, detail="Product not found")
     review_dict = review.dict()
     review_obj = Review(**review_dict)
-    try:
-        await db.reviews.insert_one(review_obj.dict())
-    except Exception:
-        raise HTTPException(status_code=503, detail="Database unavailable")
-    return review_obj
+    # Batched by the write-behind queue; listings refresh once the batch lands
+    await write_queue.put("reviews", review_obj.dict())
+    return model_response(review_obj)
 
 # Categories endpoint
 @router.get("/categories", response_model=List[Category])
-async def get_categories():
-    try:
-        categories = await db.categories.find().to_list(length=20)
+async def get_categories(request: Request):
+    async def load():
+        categories = await db.categories.find().to_list(length=None)
         return [Category(**category) for category in categories]
+
+    try:
+        return await cached_json(request, "categories", None, load)
     except Exception:
         # Seeded categories from uploads/seeds if available
         try:
@@ -107,7 +322,7 @@ async def get_categories():
                         nameIt="Combi",
                         nameTr="Kombi",
                         icon="radiator",
-                        image="https://images.unsplash.com/photo-1604014239322-9b974e6a5c63?w=800&auto=format&fit=crop"
+                        image="/api/img/kombi/hermetik-klasik-tip/img-1.jpg?preset=tile"
                     ),
                     Category(
                         id="condensing",
@@ -116,7 +331,7 @@ async def get_categories():
                         nameIt="Condensing",
                         nameTr="Yoğuşmalı",
                         icon="flame",
-                        image="https://images.unsplash.com/photo-1517245386807-bb43f82c33c4?w=800&auto=format&fit=crop"
+                        image="/api/img/kombi/tam-yogusmali-premix-tip/img-1.jpg?preset=tile"
                     ),
                 ]
             data = json.loads(seeds_path.read_text(encoding="utf-8"))
@@ -126,40 +341,48 @@ async def get_categories():
 
 # Catalogs
 @router.get("/catalogs")
-async def get_catalogs():
+async def get_catalogs(request: Request, lang: Optional[str] = Depends(resolve_lang)):
+    async def load():
+        return await db.catalogs.find({}, {"_id": 0}).sort("order", 1).to_list(length=None)
+
     try:
-        catalogs = await db.catalogs.find().sort("order", 1).to_list(length=100)
-        return catalogs
+        return await cached_json(request, "catalogs", None, load, lang)
     except Exception:
         # Sample catalogs fallback
-        return [
+        return localized_response([
             {
                 "id": "sample-catalog-1",
                 "name": {"tr": "Ürün Kataloğu", "en": "Product Catalog", "ru": "Каталог продукции", "it": "Catalogo Prodotti"},
                 "description": {"tr": "PDF kataloğu indirin.", "en": "Download the PDF catalog.", "ru": "Скачать PDF каталог.", "it": "Scarica il catalogo PDF."},
                 "file_url": "https://www.w3.org/WAI/ER/tests/xhtml/testfiles/resources/pdf/dummy.pdf",
-                "thumbnail": "https://images.unsplash.com/photo-1519681393784-d120267933ba?w=800&auto=format&fit=crop",
+                "thumbnail": "/api/img/kombi/kombi-genel/img-1.jpg?preset=catalog",
                 "file_size": "1.2 MB",
                 "order": 1,
             }
-        ]
+        ], lang)
 
 @router.get("/catalogs/{catalog_id}")
-async def get_catalog(catalog_id: str):
+async def get_catalog(request: Request, catalog_id: str, lang: Optional[str] = Depends(resolve_lang)):
+    async def load():
+        return await db.catalogs.find_one({"id": catalog_id}, {"_id": 0})
+
     try:
-        catalog = await db.catalogs.find_one({"id": catalog_id})
+        response = await cached_json(request, "catalogs", {"id": catalog_id}, load, lang)
     except Exception:
-        catalog = None
-    if not catalog:
+        response = None
+    if response is None:
         raise HTTPException(status_code=404, detail="Catalog not found")
-    return catalog
+    return response
 
 # Hero Slides endpoint
 @router.get("/hero-slides", response_model=List[HeroSlide])
-async def get_hero_slides():
-    try:
-        slides = await db.hero_slides.find().sort("order", 1).to_list(length=20)
+async def get_hero_slides(request: Request, lang: Optional[str] = Depends(resolve_lang)):
+    async def load():
+        slides = await db.hero_slides.find().sort("order", 1).to_list(length=None)
         return [HeroSlide(**slide) for slide in slides]
+
+    try:
+        return await cached_json(request, "hero_slides", None, load, lang)
     except Exception:
         # Seeded hero slides from uploads/seeds if available
         try:
@@ -169,47 +392,56 @@ async def get_hero_slides():
             if not seeds_path.exists():
                 return []
             data = json.loads(seeds_path.read_text(encoding="utf-8"))
-            return [HeroSlide(**s) for s in data]
+            return localized_response([HeroSlide(**s) for s in data], lang)
         except Exception:
             return []
 
 # Contact form endpoint
 @router.post("/contact")
 async def submit_contact_form(form: ContactForm):
-    try:
-        await db.contact_forms.insert_one(form.dict())
-        return {"message": "Contact form submitted successfully", "id": form.id}
-    except Exception:
-        # Accept submission but report degraded state
-        return {"message": "Contact form received (DB offline)", "id": form.id}
+    # Batched by the write-behind queue, journaled to disk while MongoDB is down
+    await write_queue.put("contact_forms", form.dict())
+    return {"message": "Contact form submitted successfully", "id": form.id}
 
 # Search endpoint
 @router.get("/search")
-async def search_products(q: str, limit: int = Query(default=20, le=50)):
+async def search_products(
+    q: str,
+    limit: int = Query(default=20, le=50),
+    view: str = Query(default="full", pattern="^(full|card)$"),
+    lang: Optional[str] = Depends(resolve_lang),
+):
     if not q or len(q) < 2:
         return []
     
-    # Simple text search in name and description
+    # Ranked lookup in the in-memory index, then one $in fetch for the hits
     try:
-        products = await db.products.find({
-            "$or": [
-                {"name": {"$regex": q, "$options": "i"}},
-                {"description": {"$regex": q, "$options": "i"}}
-            ]
-        }).limit(limit).to_list(length=limit)
-        return [Product(**product) for product in products]
+        await search_index.ensure_fresh(db)
+        product_ids = search_index.search(q, limit=limit)
+        if not product_ids:
+            return []
+        if view == "card":
+            cards = await db.product_cards.find({"id": {"$in": product_ids}}, {"_id": 0}).to_list(length=limit)
+            by_id = {card["id"]: card for card in cards}
+            return localized_response([by_id[pid] for pid in product_ids if pid in by_id], lang)
+        products = await db.products.find({"id": {"$in": product_ids}}).to_list(length=limit)
+        by_id = {product["id"]: product for product in products}
+        return localized_response([Product(**by_id[pid]) for pid in product_ids if pid in by_id], lang)
     except Exception:
         return []
 # Site Settings
 @router.get("/settings")
-async def get_public_settings():
+async def get_public_settings(request: Request, lang: Optional[str] = Depends(resolve_lang)):
     # Try DB first
+    async def load():
+        return await db.site_settings.find_one({"id": "site_settings"}, {"_id": 0})
+
     try:
-        settings = await db.site_settings.find_one({"id": "site_settings"})
+        response = await cached_json(request, "site_settings", None, load, lang)
     except Exception:
-        settings = None
+        response = None
 
-    if not settings:
+    if response is None:
         # Try seeded file fallback
         try:
             from pathlib import Path
@@ -217,16 +449,37 @@ async def get_public_settings():
             seeds_path = Path(__file__).parent / "uploads" / "seeds" / "site_settings.json"
             if seeds_path.exists():
                 data = json.loads(seeds_path.read_text(encoding="utf-8"))
-                return data
+                return localize(data, lang)
         except Exception:
             pass
         # Finally defaults
-        return {
+        return localized_response({
             "site_name": {"tr": "WolfTerm Solutions", "en": "WolfTerm Solutions", "ru": "WolfTerm Solutions", "it": "WolfTerm Solutions"},
             "logo_url": "https://customer-assets.emergentagent.com/job_17a22ec5-8e56-4b05-8432-58bb6f63aed4/artifacts/xojo9jlu_wolfterm%20logo.png",
             "contact_email": "info@wolfterm.com",
             "contact_phone": "",
             "primary_color": "#dc2626"
-        }
-    return settings
+        }, lang)
+    return response
 
+# On-demand image variants of anything under /uploads (whitelisted sizes only)
+@router.get("/img/{path:path}")
+async def transform_image(
+    path: str,
+    request: Request,
+    preset: Optional[str] = None,
+    w: Optional[int] = None,
+    h: Optional[int] = None,
+    fit: Optional[str] = None,
+    fmt: Optional[str] = None,
+):
+    spec = parse_spec(preset, w, h, fit, fmt, request.headers.get("accept"))
+    source = resolve_source(path)
+    name = cache_key(source, spec)
+    headers = {"ETag": f'"{name}"', "Cache-Control": f"public, max-age={IMG_CACHE_MAX_AGE}"}
+    if not fmt or fmt == "auto":
+        headers["Vary"] = "Accept"
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    variant = await get_variant(source, spec, name)
+    return FileResponse(variant, media_type=MEDIA_TYPES[spec.fmt], headers=headers)
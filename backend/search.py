@@ -0,0 +1,245 @@
+"""In-memory inverted index for product search.
+
+Indexes every language of ``name``/``description`` plus category, model names
+and technical specs. Text is folded Turkish-aware (İ/I/ı -> i, ş -> s, ğ -> g,
+...) and stripped of diacritics, so "isitma", "ISITMA" and "ısıtma" all match.
+Every query token matches as a prefix, exact terms rank higher, and all tokens
+must match (AND).
+"""
+import asyncio
+import bisect
+import heapq
+import math
+import os
+import re
+import time
+import unicodedata
+from collections import defaultdict
+from operator import itemgetter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from models import LANGUAGES
+
+# Field weights used when scoring a term hit
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "model_name": 2.5,
+    "category": 1.5,
+    "technical_specs": 1.0,
+    "description": 1.0,
+}
+
+PREFIX_PENALTY = 0.5
+
+# Other workers may write products; rebuild from the DB after this many seconds
+SEARCH_INDEX_TTL = float(os.environ.get("SEARCH_INDEX_TTL", "300"))
+
+_TURKISH_FOLD = str.maketrans({
+    "İ": "i", "I": "i", "ı": "i",
+    "Ş": "s", "ş": "s",
+    "Ğ": "g", "ğ": "g",
+    "Ç": "c", "ç": "c",
+    "Ö": "o", "ö": "o",
+    "Ü": "u", "ü": "u",
+})
+
+_TOKEN_RE = re.compile(r"\d+(?:[.,]\d+)+|[^\W_]+")
+
+# Shorter query tokens only match whole terms
+MIN_PREFIX_LENGTH = 2
+
+
+def fold(text: str) -> str:
+    text = text.translate(_TURKISH_FOLD).casefold()
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text: str) -> List[str]:
+    return [token.replace(",", ".") for token in _TOKEN_RE.findall(fold(text))]
+
+
+def _texts(value) -> Iterable[str]:
+    """Yield the strings of a ``MultiLangText | str`` field"""
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for lang in LANGUAGES:
+            text = value.get(lang)
+            if isinstance(text, str):
+                yield text
+
+
+def document_terms(product: dict) -> Dict[str, float]:
+    """Map each term of a product document to its weighted frequency"""
+    terms: Dict[str, float] = defaultdict(float)
+
+    def add(field: str, text: str):
+        for token in tokenize(text):
+            terms[token] += FIELD_WEIGHTS[field]
+
+    for text in _texts(product.get("name")):
+        add("name", text)
+    for text in _texts(product.get("description")):
+        add("description", text)
+    if isinstance(product.get("category"), str):
+        add("category", product["category"])
+    for model in product.get("models") or []:
+        if isinstance(model.get("model_name"), str):
+            add("model_name", model["model_name"])
+        for spec in (model.get("technical_specs") or {}).values():
+            if isinstance(spec, str):
+                add("technical_specs", spec)
+    return dict(terms)
+
+
+class SearchIndex:
+    """Inverted index with incremental add/remove and prefix lookup"""
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._doc_terms: Dict[str, Dict[str, float]] = {}
+        self._vocabulary: List[str] = []
+        self._built_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def add(self, product: dict) -> None:
+        for term in self._add(product):
+            bisect.insort(self._vocabulary, term)
+
+    def _add(self, product: dict) -> List[str]:
+        """Index ``product``; returns terms new to the index, not yet in the vocabulary"""
+        product_id = product.get("id")
+        if not product_id:
+            return []
+        self.remove(product_id)
+        terms = document_terms(product)
+        self._doc_terms[product_id] = terms
+        new_terms = []
+        for term, weight in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                new_terms.append(term)
+            postings[product_id] = weight
+        return new_terms
+
+    def remove(self, product_id: str) -> None:
+        terms = self._doc_terms.pop(product_id, None)
+        if not terms:
+            return
+        for term in terms:
+            postings = self._postings[term]
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[term]
+                index = bisect.bisect_left(self._vocabulary, term)
+                del self._vocabulary[index]
+
+    def clear(self) -> None:
+        self._postings.clear()
+        self._doc_terms.clear()
+        self._vocabulary.clear()
+        self._built_at = None
+
+    def _prefixed(self, prefix: str) -> Iterable[str]:
+        if len(prefix) < MIN_PREFIX_LENGTH:
+            if prefix in self._postings:
+                yield prefix
+            return
+        vocabulary = self._vocabulary
+        index = bisect.bisect_left(vocabulary, prefix)
+        while index < len(vocabulary) and vocabulary[index].startswith(prefix):
+            yield vocabulary[index]
+            index += 1
+
+    def _idf(self, term: str) -> float:
+        return math.log(1 + len(self._doc_terms) / len(self._postings[term]))
+
+    def _score_terms(self, terms: List[Tuple[str, float]]) -> Dict[str, float]:
+        scores: Dict[str, float] = {}
+        for term, factor in terms:
+            postings = self._postings[term]
+            if not scores:
+                scores = {pid: weight * factor for pid, weight in postings.items()}
+                continue
+            for product_id, weight in postings.items():
+                score = weight * factor
+                if score > scores.get(product_id, 0.0):
+                    scores[product_id] = score
+        return scores
+
+    def search(self, query: str, limit: int = 20) -> List[str]:
+        """Return product ids ranked by relevance"""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        # Resolve every token to its matching terms, then intersect starting
+        # from the rarest token so later tokens only probe surviving ids.
+        matches = []
+        for token in tokens:
+            terms = [
+                (term, self._idf(term) * (1.0 if term == token else PREFIX_PENALTY))
+                for term in self._prefixed(token)
+            ]
+            if not terms:
+                return []
+            size = sum(len(self._postings[term]) for term, _ in terms)
+            matches.append((size, terms))
+        matches.sort(key=itemgetter(0))
+
+        scores = self._score_terms(matches[0][1])
+        for size, terms in matches[1:]:
+            if len(scores) * len(terms) < size:
+                narrowed = {}
+                for product_id, score in scores.items():
+                    best = max(self._postings[term].get(product_id, 0.0) * factor for term, factor in terms)
+                    if best:
+                        narrowed[product_id] = score + best
+            else:
+                token_scores = self._score_terms(terms)
+                narrowed = {
+                    product_id: score + token_scores[product_id]
+                    for product_id, score in scores.items()
+                    if product_id in token_scores
+                }
+            scores = narrowed
+            if not scores:
+                return []
+
+        ranked = heapq.nlargest(limit, scores.items(), key=itemgetter(1))
+        return [product_id for product_id, _ in ranked]
+
+    def mark_stale(self) -> None:
+        """Force a rebuild on the next search, e.g. after a bulk write"""
+        self._built_at = None
+
+    def is_stale(self) -> bool:
+        return self._built_at is None or time.monotonic() - self._built_at > SEARCH_INDEX_TTL
+
+    async def rebuild(self, db) -> None:
+        projection = {"_id": 0, "id": 1, "name": 1, "description": 1, "category": 1,
+                      "models.model_name": 1, "models.technical_specs": 1}
+        fresh = SearchIndex()
+        async for product in db.products.find({}, projection):
+            # Sorted once below; insort per new term is quadratic in the vocabulary
+            fresh._vocabulary.extend(fresh._add(product))
+        fresh._vocabulary.sort()
+        self._postings = fresh._postings
+        self._doc_terms = fresh._doc_terms
+        self._vocabulary = fresh._vocabulary
+        self._built_at = time.monotonic()
+
+    async def ensure_fresh(self, db) -> None:
+        if not self.is_stale():
+            return
+        async with self._lock:
+            if self.is_stale():
+                await self.rebuild(db)
+
+
+search_index = SearchIndex()
@@ -221,3 +221,16 @@ async def seed_database(db):
     
     print("Database seeded successfully!")
     return True
+
+
+if __name__ == "__main__":
+    import asyncio
+    import database
+
+    async def main():
+        try:
+            await seed_database(database.db)
+        finally:
+            database.close()
+
+    asyncio.run(main())
@@ -641,3 +641,16 @@ async def seed_database(db):
     print(f"   - Added {len(categories)} categories")
     print(f"   - Added {len(hero_slides)} hero slides")
     print(f"   - Added {len(reviews)} reviews")
+
+
+if __name__ == "__main__":
+    import asyncio
+    import database
+
+    async def main():
+        try:
+            await seed_database(database.db)
+        finally:
+            database.close()
+
+    asyncio.run(main())
@@ -1,11 +1,10 @@
 from fastapi import FastAPI, APIRouter
-from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
+import asyncio
 from pydantic import BaseModel, Field, ConfigDict
 from typing import List
 import uuid
@@ -22,14 +21,21 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-# Use short timeouts to avoid blocking startup if MongoDB is unavailable
-client = AsyncIOMotorClient(mongo_url, serverSelectionTimeoutMS=1000, connectTimeoutMS=1000)
-db = client[os.environ['DB_NAME']]
+# MongoDB connection (single pooled client shared by every router)
+import database
+from database import db
+from indexes import ensure_indexes
+from product_cards import ensure_cards
+from admin_users import ensure_default_admin
+from write_behind import write_queue
+from review_stats import ensure_review_stats
+from static_files import UploadsStaticFiles
+from compression import CompressionMiddleware
+from rate_limit import RateLimitMiddleware
+from fast_json import FastJSONResponse, model_response
 
 # Create the main app without a prefix
-app = FastAPI(title="WolfTerm API", version="1.0.0")
+app = FastAPI(title="WolfTerm API", version="1.0.0", default_response_class=FastJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -55,24 +61,16 @@ async def root():
 async def create_status_check(input: StatusCheckCreate):
     status_dict = input.model_dump()
     status_obj = StatusCheck(**status_dict)
-    
-    # Convert to dict and serialize datetime to ISO string for MongoDB
-    doc = status_obj.model_dump()
-    doc['timestamp'] = doc['timestamp'].isoformat()
-    
-    _ = await db.status_checks.insert_one(doc)
-    return status_obj
+
+    # datetimes are stored as BSON dates and encoded natively in responses
+    _ = await db.status_checks.insert_one(status_obj.model_dump())
+    return model_response(status_obj)
 
 @api_router.get("/status", response_model=List[StatusCheck])
 async def get_status_checks():
     # Exclude MongoDB's _id field from the query results
     status_checks = await db.status_checks.find({}, {"_id": 0}).to_list(1000)
-    
-    # Convert ISO string timestamps back to datetime objects
-    for check in status_checks:
-        if isinstance(check['timestamp'], str):
-            check['timestamp'] = datetime.fromisoformat(check['timestamp'])
-    
+    # Older documents stored ISO strings; response_model validation parses both
     return status_checks
 
 # Import and include routes from routes.py
@@ -92,6 +90,11 @@ except ImportError as e:
 # Include the router in the main app
 app.include_router(api_router)
 
+# gzip/brotli for JSON, exports and text uploads (per-route rules in compression.py)
+app.add_middleware(CompressionMiddleware)
+# Inside CORS so 429s still carry CORS headers for browser clients
+app.add_middleware(RateLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -99,11 +102,11 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-# Static files for uploaded images
+# Static files for uploaded images and catalog PDFs (precompressed siblings, ranges)
 try:
     uploads_dir = ROOT_DIR / 'uploads'
     uploads_dir.mkdir(exist_ok=True)
-    app.mount("/uploads", StaticFiles(directory=str(uploads_dir)), name="uploads")
+    app.mount("/uploads", UploadsStaticFiles(directory=str(uploads_dir)), name="uploads")
 except Exception as e:
     logger.warning(f"Could not mount /uploads static directory: {e}")
 # Startup event to seed initial data
@@ -111,6 +114,12 @@ except Exception as e:
 async def startup_db():
     # Check if products collection is empty and seed initial data
     # Wrap in try/except to avoid startup failure when MongoDB is unavailable
+    if await database.connect():
+        # Build missing indexes in the background so startup isn't held up
+        app.state.index_task = asyncio.create_task(ensure_indexes(db))
+        app.state.cards_task = asyncio.create_task(ensure_cards(db))
+        app.state.users_task = asyncio.create_task(ensure_default_admin(db))
+        app.state.review_stats_task = asyncio.create_task(ensure_review_stats(db))
     try:
         count = await db.products.count_documents({})
         logger.info(f"Products in database: {count}")
@@ -121,7 +130,14 @@ async def startup_db():
         #     logger.info("Database seeded with initial data")
     except Exception as e:
         logger.warning(f"Skipping DB check at startup: {e}")
+    # Runs even when MongoDB is down: submissions are journaled and replayed later
+    write_queue.start()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
+    for name in ("index_task", "cards_task", "users_task", "review_stats_task"):
+        task = getattr(app.state, name, None)
+        if task and not task.done():
+            task.cancel()
+    await write_queue.stop()
+    database.close()
@@ -0,0 +1,187 @@
+"""Numeric views of ``TechnicalSpec`` strings and the spec filter/facet queries.
+
+Spec values are free text ("20.3 kW", "92%", "710 x 410 x 260 mm"). At write
+time each model's specs are parsed into canonical units (kW, %, l/min, kg,
+mm) and stored on its product card (see ``product_cards``), where range
+filters and facets run against indexed numbers instead of strings.
+"""
+import re
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+
+# Canonical unit -> accepted spellings and their factor to the canonical unit
+UNITS: Dict[str, Dict[Optional[str], float]] = {
+    "kW": {None: 1, "kw": 1, "w": 0.001, "kcal/h": 1 / 860, "kcal/saat": 1 / 860},
+    "%": {None: 1, "%": 1},
+    "l/min": {None: 1, "l/min": 1, "lt/min": 1, "l/dk": 1, "lt/dk": 1, "l/h": 1 / 60, "m3/h": 1000 / 60},
+    "kg": {None: 1, "kg": 1, "g": 0.001},
+    "mm": {None: 1, "mm": 1, "cm": 10, "m": 1000},
+}
+
+_QUANTITY = re.compile(r"(\d+(?:[.,]\d+)?)\s*((?:[a-zA-Z]+\d?|%)(?:/[a-zA-Z]+)?)?")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)?")
+_LENGTH_UNIT = re.compile(r"\d\s*(mm|cm|m)\b")
+_ENERGY_CLASS = re.compile(r"^\s*([A-G])(\+{0,3})\s*$", re.IGNORECASE)
+
+# Range filter parameters: name -> (model spec field, operator)
+RANGE_FILTERS = {
+    "output_kw_min": ("output_kw_max", "$gte"),
+    "output_kw_max": ("output_kw_min", "$lte"),
+    "efficiency_min": ("efficiency_pct", "$gte"),
+    "hot_water_flow_min": ("hot_water_flow_lpm", "$gte"),
+}
+
+# Upper bounds of the output facet buckets, kW
+OUTPUT_BUCKETS = [0, 15, 20, 25, 30, 35, 50, 100, 1000]
+
+
+def parse_quantity(value, unit: str, last: bool = False) -> Optional[float]:
+    """First (or last, for ranges like "9.4-24 kW") number in ``value``, converted to ``unit``"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    matches = _QUANTITY.findall((value or "").replace("³", "3"))
+    if not matches:
+        return None
+    number, suffix = matches[-1] if last else matches[0]
+    if not suffix:
+        # "9.4 - 24 kW": the unit trails the last number
+        suffix = matches[-1][1]
+    factor = UNITS[unit].get(suffix.lower() if suffix else None)
+    if factor is None:
+        return None
+    return round(float(number.replace(",", ".")) * factor, 3)
+
+
+def parse_dimensions(value) -> Optional[List[float]]:
+    """``"710 x 410 x 260 mm"`` -> ``[710.0, 410.0, 260.0]`` in mm"""
+    numbers = _NUMBER.findall(value or "")
+    if not numbers:
+        return None
+    unit = _LENGTH_UNIT.search(value.lower())
+    factor = UNITS["mm"][unit.group(1) if unit else None]
+    return [round(float(number.replace(",", ".")) * factor, 1) for number in numbers[:3]]
+
+
+def normalize_energy_class(value) -> Optional[str]:
+    match = _ENERGY_CLASS.match(value or "")
+    if not match:
+        return None
+    letter, pluses = match.groups()
+    return letter.upper() + pluses
+
+
+def energy_class_rank(value: Optional[str]):
+    """Sort key where lower is better: A+++ < A++ < A+ < A < B ..."""
+    normalized = normalize_energy_class(value)
+    if normalized is None:
+        return None
+    return normalized[0], -len(normalized) + 1
+
+
+def model_specs(model: dict) -> dict:
+    """Canonical numeric specs for one ProductModel"""
+    specs = model.get("technical_specs") or {}
+    output_min = parse_quantity(specs.get("rated_output_min") or specs.get("heating_output_min"), "kW")
+    output_max = parse_quantity(specs.get("rated_output_max") or specs.get("heating_output_max"), "kW", last=True)
+    return {
+        "model_name": model.get("model_name", ""),
+        # A single published figure bounds the range on both sides
+        "output_kw_min": output_min if output_min is not None else output_max,
+        "output_kw_max": output_max if output_max is not None else output_min,
+        "efficiency_pct": parse_quantity(specs.get("efficiency"), "%"),
+        "energy_class": normalize_energy_class(specs.get("energy_class")),
+        "hot_water_flow_lpm": parse_quantity(specs.get("hot_water_flow"), "l/min"),
+        "weight_kg": parse_quantity(specs.get("net_weight"), "kg"),
+        "dimensions_mm": parse_dimensions(specs.get("dimensions")),
+    }
+
+
+def spec_filter(
+    output_kw_min: Optional[float] = None,
+    output_kw_max: Optional[float] = None,
+    efficiency_min: Optional[float] = None,
+    hot_water_flow_min: Optional[float] = None,
+    energy_class: Optional[str] = None,
+) -> Optional[dict]:
+    """Card query matching products with at least one model meeting every condition"""
+    values = {
+        "output_kw_min": output_kw_min,
+        "output_kw_max": output_kw_max,
+        "efficiency_min": efficiency_min,
+        "hot_water_flow_min": hot_water_flow_min,
+    }
+    conditions: Dict[str, dict] = {}
+    for name, value in values.items():
+        if value is None:
+            continue
+        field, operator = RANGE_FILTERS[name]
+        conditions.setdefault(field, {})[operator] = value
+    if energy_class:
+        classes = [normalize_energy_class(c) for c in energy_class.split(",")]
+        if None in classes:
+            raise HTTPException(status_code=400, detail="energy_class must be A+++..G, comma-separated")
+        conditions["energy_class"] = {"$in": classes}
+    if not conditions:
+        return None
+    return {"specs": {"$elemMatch": conditions}}
+
+
+def facet_pipeline(category: Optional[str], spec_query: Optional[dict]) -> List[dict]:
+    """One aggregation over product_cards returning every facet.
+
+    Category counts honour the spec filters only (so other categories stay
+    selectable); the remaining facets also honour ``category``. Counts are
+    products, not models.
+    """
+    in_category = [{"$match": {"category": category}}] if category else []
+    return [
+        {"$match": spec_query or {}},
+        {"$facet": {
+            "categories": [
+                {"$group": {"_id": "$category", "count": {"$sum": 1}}},
+                {"$sort": {"_id": 1}},
+            ],
+            "total": in_category + [{"$count": "count"}],
+            "energy_classes": in_category + [
+                {"$unwind": "$specs"},
+                {"$match": {"specs.energy_class": {"$ne": None}}},
+                {"$group": {"_id": "$specs.energy_class", "ids": {"$addToSet": "$id"}}},
+                {"$project": {"count": {"$size": "$ids"}}},
+                {"$sort": {"_id": 1}},
+            ],
+            "output_kw": in_category + [
+                {"$unwind": "$specs"},
+                {"$match": {"specs.output_kw_max": {"$ne": None}}},
+                {"$bucket": {
+                    "groupBy": "$specs.output_kw_max",
+                    "boundaries": OUTPUT_BUCKETS,
+                    "default": "other",
+                    "output": {"ids": {"$addToSet": "$id"}},
+                }},
+                {"$project": {"count": {"$size": "$ids"}}},
+            ],
+        }},
+    ]
+
+
+def shape_facets(result: Optional[dict]) -> dict:
+    result = result or {}
+    total = result.get("total") or [{}]
+    output = []
+    for bucket in result.get("output_kw", []):
+        lower = bucket["_id"]
+        if lower == "other":
+            output.append({"min": None, "max": None, "count": bucket["count"]})
+            continue
+        upper = OUTPUT_BUCKETS[OUTPUT_BUCKETS.index(lower) + 1]
+        output.append({"min": lower, "max": upper, "count": bucket["count"]})
+    return {
+        "total": total[0].get("count", 0),
+        "categories": [{"value": f["_id"], "count": f["count"]} for f in result.get("categories", [])],
+        "energy_classes": sorted(
+            ({"value": f["_id"], "count": f["count"]} for f in result.get("energy_classes", [])),
+            key=lambda f: energy_class_rank(f["value"]) or ("Z", 0),
+        ),
+        "output_kw": output,
+    }
@@ -0,0 +1,183 @@
+"""Static serving for ``/uploads``: precompressed siblings, byte ranges, long-lived caching.
+
+- ``foo.pdf.br`` / ``foo.pdf.gz`` (written by ``tools/precompress_uploads.py``)
+  are served in place of ``foo.pdf`` when the client accepts that encoding.
+- Single ``Range`` requests get a 206 streamed straight from disk, so PDF
+  viewers and download managers can resume or fetch pages without pulling
+  the whole file.
+- Content-hashed names (upload derivatives and stored uploads) never change
+  and are marked immutable; everything else gets a short max-age and relies
+  on ETag/Last-Modified revalidation.
+"""
+import os
+import re
+from typing import Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Receive, Scope, Send
+
+STATIC_MAX_AGE = int(os.environ.get("STATIC_MAX_AGE", "3600"))
+IMMUTABLE_MAX_AGE = 31536000
+RANGE_CHUNK_SIZE = 256 * 1024
+
+# Worth precompressing; already-compressed images are not
+COMPRESSIBLE_SUFFIXES = (".pdf", ".svg", ".json", ".txt", ".csv", ".xml", ".html", ".css", ".js")
+# (encoding token, sibling suffix) in order of preference
+PRECOMPRESSED_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+# uploads/<32 hex>.<ext> and uploads/images/<32 hex>/<variant>
+_HASHED_PATH = re.compile(r"(^|/)[0-9a-f]{32}(\.[^/]+$|/)")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def is_content_hashed(path: str) -> bool:
+    return bool(_HASHED_PATH.search(path))
+
+
+def accepted_encodings(accept_encoding: Optional[str]) -> set:
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        token, *params = part.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(token.strip().lower())
+    return accepted
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Return inclusive ``(start, end)`` for a single byte range; None if unsatisfiable.
+
+    Raises ValueError for headers we don't handle (multiple ranges,
+    other units), in which case the full file is served.
+    """
+    match = _RANGE.match(header.strip())
+    if not match:
+        raise ValueError(header)
+    first, last = match.groups()
+    if not first and not last:
+        raise ValueError(header)
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return None
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return None
+    return start, end
+
+
+class FileRangeResponse(Response):
+    """206 response streaming ``[start, end]`` of a file in chunks"""
+
+    def __init__(self, path: str, start: int, end: int, headers: dict, media_type: Optional[str] = None):
+        super().__init__(status_code=206, headers=headers, media_type=media_type)
+        self.path = path
+        self.start = start
+        self.end = end
+        self.headers["content-length"] = str(end - start + 1)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"] == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        remaining = self.end - self.start + 1
+        async with await anyio.open_file(self.path, mode="rb") as f:
+            await f.seek(self.start)
+            while remaining > 0:
+                chunk = await f.read(min(RANGE_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class UploadsStaticFiles(StaticFiles):
+    def file_response(self, full_path, stat_result, scope: Scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        path = str(full_path)
+        relative = os.path.relpath(path, str(self.directory)).replace(os.sep, "/")
+        cache_control = (
+            f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+            if is_content_hashed(relative)
+            else f"public, max-age={STATIC_MAX_AGE}"
+        )
+        compressible = path.lower().endswith(COMPRESSIBLE_SUFFIXES)
+
+        response = FileResponse(path, status_code=status_code, stat_result=stat_result)
+        response.headers["cache-control"] = cache_control
+        response.headers["accept-ranges"] = "bytes"
+        if compressible:
+            response.headers["vary"] = "Accept-Encoding"
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+
+        range_header = request_headers.get("range")
+        if range_header and self._if_range_matches(request_headers.get("if-range"), response.headers):
+            size = stat_result.st_size
+            try:
+                byte_range = parse_range(range_header, size)
+            except ValueError:
+                pass  # Unsupported range form: serve the whole file
+            else:
+                if byte_range is None:
+                    return Response(status_code=416, headers={"content-range": f"bytes */{size}"})
+                start, end = byte_range
+                headers = {
+                    k: v for k, v in response.headers.items()
+                    if k in ("etag", "last-modified", "cache-control", "accept-ranges", "vary")
+                }
+                headers["content-range"] = f"bytes {start}-{end}/{size}"
+                return FileRangeResponse(path, start, end, headers, media_type=response.media_type)
+
+        if compressible:
+            encoded = self._precompressed(path, stat_result, request_headers.get("accept-encoding"))
+            if encoded is not None:
+                encoded_path, encoding, encoded_stat = encoded
+                encoded_response = FileResponse(
+                    encoded_path, status_code=status_code, stat_result=encoded_stat, media_type=response.media_type
+                )
+                # Encoded bytes get their own validator, and no ranges over them
+                encoded_response.headers["content-encoding"] = encoding
+                encoded_response.headers["cache-control"] = cache_control
+                encoded_response.headers["vary"] = "Accept-Encoding"
+                if self.is_not_modified(encoded_response.headers, request_headers):
+                    return NotModifiedResponse(encoded_response.headers)
+                return encoded_response
+        return response
+
+    @staticmethod
+    def _if_range_matches(if_range: Optional[str], headers) -> bool:
+        if not if_range:
+            return True
+        return if_range.strip() in (headers.get("etag"), headers.get("last-modified"))
+
+    @staticmethod
+    def _precompressed(path: str, stat_result: os.stat_result, accept_encoding: Optional[str]):
+        accepted = accepted_encodings(accept_encoding)
+        for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+            if encoding not in accepted:
+                continue
+            try:
+                encoded_stat = os.stat(path + suffix)
+            except OSError:
+                continue
+            # A sibling older than its source is stale
+            if encoded_stat.st_mtime >= stat_result.st_mtime:
+                return path + suffix, encoding, encoded_stat
+        return None
@@ -0,0 +1,110 @@
+"""Benchmark CompressionMiddleware against the uncompressed path.
+
+Builds a synthetic product list (every language and every TechnicalSpec /
+ComponentsUsed field filled), then pushes it through the middleware as a
+single JSON body and as a chunked NDJSON stream, reporting bytes on the wire
+and time per response for identity, gzip and (if installed) brotli.
+
+    python tools/bench_compression.py [--products 200] [--models 4] [--repeat 20]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from compression import CompressionMiddleware, brotli  # noqa: E402
+from export import COMPONENT_FIELDS, SPEC_FIELDS  # noqa: E402
+from models import LANGUAGES  # noqa: E402
+
+
+def synthetic_products(count: int, models: int) -> list:
+    return [
+        {
+            "id": f"product-{i}",
+            "name": {lang: f"Kombi {i} ({lang})" for lang in LANGUAGES},
+            "description": {lang: f"High-efficiency condensing boiler {i}, {lang} description. " * 4 for lang in LANGUAGES},
+            "category": ("combi", "condensing", "premix")[i % 3],
+            "images": [f"/uploads/images/{i:032x}/1280.jpg"],
+            "models": [
+                {
+                    "model_name": f"WT-{i}-{m}",
+                    "technical_specs": {field: f"{(i * 7 + m) % 97}.{m} unit" for field in SPEC_FIELDS},
+                    "components": {field: f"Vendor {m} {field}" for field in COMPONENT_FIELDS},
+                }
+                for m in range(models)
+            ],
+        }
+        for i in range(count)
+    ]
+
+
+def make_app(chunks, media_type):
+    async def app(scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", media_type.encode())],
+        })
+        for index, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": index < len(chunks) - 1})
+    return CompressionMiddleware(app)
+
+
+async def measure(app, path, accept_encoding, repeat):
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "headers": [(b"accept-encoding", accept_encoding.encode())] if accept_encoding else [],
+    }
+    sent = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal sent
+        if message["type"] == "http.response.body":
+            sent += len(message.get("body", b""))
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        sent = 0
+        await app(scope, receive, send)
+    return sent, (time.perf_counter() - started) / repeat * 1000
+
+
+async def run(args):
+    products = synthetic_products(args.products, args.models)
+    body = json.dumps(products, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    lines = [json.dumps(p, ensure_ascii=False).encode("utf-8") + b"\n" for p in products]
+    ndjson = [b"".join(lines[i:i + 50]) for i in range(0, len(lines), 50)]
+
+    cases = [
+        ("list  /api/products", make_app([body], "application/json"), "/api/products"),
+        ("export /api/products/export", make_app(ndjson, "application/x-ndjson"), "/api/products/export"),
+    ]
+    encodings = [("identity", ""), ("gzip", "gzip")] + ([("br", "br, gzip")] if brotli else [])
+    for label, app, path in cases:
+        print(label)
+        for name, accept in encodings:
+            size, ms = await measure(app, path, accept, args.repeat)
+            print(f"  {name:<9}{size:>10} bytes  {ms:8.2f} ms/response")
+    if brotli is None:
+        print("(brotli not installed; br skipped)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--models", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
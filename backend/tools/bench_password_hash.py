@@ -0,0 +1,57 @@
+"""Measure password hash/verify latency per cost setting.
+
+Run on the production hardware before changing BCRYPT_ROUNDS (or the
+argon2 costs): every login pays one verify, and AUTH_HASH_WORKERS of them
+run at a time, so the verify time bounds login throughput per worker.
+
+    python tools/bench_password_hash.py [--rounds 10 11 12 13] [--repeat 5]
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from auth import ARGON2_MEMORY_COST, ARGON2_TIME_COST, build_password_context  # noqa: E402
+
+PASSWORD = "correct horse battery staple"
+
+
+def measure(context, repeat):
+    hash_times, verify_times = [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        hashed = context.hash(PASSWORD)
+        hash_times.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        context.verify(PASSWORD, hashed)
+        verify_times.append(time.perf_counter() - started)
+    return statistics.median(hash_times) * 1000, statistics.median(verify_times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12, 13], help="bcrypt log2 rounds")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--argon2", action="store_true", help="also measure argon2 with the configured costs")
+    args = parser.parse_args()
+
+    cases = [(f"bcrypt rounds={rounds}", build_password_context(["bcrypt"], rounds)) for rounds in args.rounds]
+    if args.argon2:
+        label = f"argon2 t={ARGON2_TIME_COST} m={ARGON2_MEMORY_COST}KiB"
+        cases.append((label, build_password_context(["argon2"])))
+
+    print(f"{'setting':<32}{'hash ms':>10}{'verify ms':>11}{'logins/s/thread':>17}")
+    for label, context in cases:
+        try:
+            hash_ms, verify_ms = measure(context, args.repeat)
+        except Exception as e:
+            print(f"{label:<32}  unavailable: {e}")
+            continue
+        print(f"{label:<32}{hash_ms:>10.1f}{verify_ms:>11.1f}{1000 / verify_ms:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
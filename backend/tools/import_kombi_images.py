@@ -1,5 +1,16 @@
+"""Convert the factory photo tree into uploads/kombi and write category/hero seeds.
+
+Conversions run in a process pool and are incremental: ``backend/.kombi_manifest.json``
+records each source's mtime, size and whether it converted. Unchanged sources
+that converted are skipped; failed ones are retried on the next run. The
+manifest is keyed by source paths, so it lives outside the public uploads tree.
+
+    python tools/import_kombi_images.py [--src DIR] [--jobs N] [--dry-run]
+"""
+import argparse
 import os
 import json
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from PIL import Image
 
@@ -7,6 +18,22 @@ from PIL import Image
 SRC_DIR = Path(__file__).resolve().parents[3] / "görseller"
 UPLOADS_DIR = Path(__file__).resolve().parents[1] / "uploads"
 SEEDS_DIR = UPLOADS_DIR / "seeds"
+KOMBI_DIR = UPLOADS_DIR / "kombi"
+MANIFEST_PATH = Path(__file__).resolve().parents[1] / ".kombi_manifest.json"
+# Earlier runs wrote it under /uploads, where it was publicly served
+LEGACY_MANIFEST_PATH = KOMBI_DIR / "manifest.json"
+
+IMAGE_SUFFIXES = (".tif", ".tiff", ".jpg", ".jpeg", ".png")
+
+# Heuristic: use named folders as categories
+CATEGORY_NAMES = [
+    "Hermetik Klasik Tip",
+    "Tam Yoğuşmalı Premix Tip",
+    "İlk tasarım",
+]
+# Numeric top-level folders (1..50) are generic combi items
+GENERIC_CATEGORY = "Kombi Genel"
+GENERIC_FOLDERS = set(map(str, range(1, 51)))
 
 
 def ensure_dirs():
@@ -26,6 +53,8 @@ def slugify(name: str) -> str:
 
 def convert_to_jpg(src_path: Path, dst_path: Path):
     dst_path.parent.mkdir(parents=True, exist_ok=True)
+    # Write next to the target and rename, so an interrupted run never leaves a truncated JPEG
+    tmp_path = dst_path.with_name(f".tmp-{dst_path.name}")
     try:
         with Image.open(src_path) as im:
             # Convert to RGB if needed
@@ -34,42 +63,98 @@ def convert_to_jpg(src_path: Path, dst_path: Path):
             elif im.mode not in ("RGB", "L"):
                 im = im.convert("RGB")
             # Save JPEG with reasonable quality
-            im.save(dst_path, format="JPEG", quality=85)
+            im.save(tmp_path, format="JPEG", quality=85)
+        os.replace(tmp_path, dst_path)
         return True
     except Exception as e:
         print(f"Failed to convert {src_path}: {e}")
+        if tmp_path.exists():
+            tmp_path.unlink()
         return False
 
 
-def scan_categories():
-    # Heuristic: use named folders as categories
-    category_names = [
-        "Hermetik Klasik Tip",
-        "Tam Yoğuşmalı Premix Tip",
-        "İlk tasarım",
-    ]
+def _convert_task(task):
+    src, dst = task
+    return convert_to_jpg(Path(src), Path(dst))
 
-    found = {}
-    # Search for those names anywhere under SRC_DIR
-    for root, dirs, files in os.walk(SRC_DIR):
-        for cname in category_names:
-            if cname.lower() in root.lower():
-                found.setdefault(cname, []).extend(
-                    [Path(root) / f for f in files if f.lower().endswith((".tif", ".tiff", ".jpg", ".jpeg", ".png"))]
-                )
-
-    # Also add numeric folders as generic combi items
-    for num in map(str, range(1, 51)):
-        p = SRC_DIR / num
-        if p.exists() and p.is_dir():
-            found.setdefault("Kombi Genel", []).extend(
-                [p / f for f in os.listdir(p) if f.lower().endswith((".tif", ".tiff", ".jpg", ".jpeg", ".png"))]
-            )
 
+def scan_categories(src_dir: Path = SRC_DIR):
+    """Walk ``src_dir`` once and group image files by category.
+
+    Directories and files are visited in sorted order so the generated
+    ``img-<n>.jpg`` names stay stable between runs.
+    """
+    lowered = [(cname, cname.lower()) for cname in CATEGORY_NAMES]
+    found = {}
+    for root, dirs, files in os.walk(src_dir):
+        dirs.sort()
+        images = [Path(root) / f for f in sorted(files) if f.lower().endswith(IMAGE_SUFFIXES)]
+        if not images:
+            continue
+        root_lower = root.lower()
+        for cname, cname_lower in lowered:
+            if cname_lower in root_lower:
+                found.setdefault(cname, []).extend(images)
+        root_path = Path(root)
+        if root_path.parent == src_dir and root_path.name in GENERIC_FOLDERS:
+            found.setdefault(GENERIC_CATEGORY, []).extend(images)
+
+    # Generic folders come last, in numeric order
+    if GENERIC_CATEGORY in found:
+        found[GENERIC_CATEGORY] = sorted(found.pop(GENERIC_CATEGORY), key=lambda p: int(p.parent.name))
     return found
 
 
-def build_seeds(found):
+def load_manifest():
+    for path in (MANIFEST_PATH, LEGACY_MANIFEST_PATH):
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            continue
+    return {}
+
+
+def save_manifest(manifest):
+    tmp_path = MANIFEST_PATH.with_name(f".tmp-{MANIFEST_PATH.name}")
+    tmp_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp_path, MANIFEST_PATH)
+    LEGACY_MANIFEST_PATH.unlink(missing_ok=True)
+
+
+def plan_conversions(found, manifest):
+    """Return ``(entries, pending)``: the target of every source and the ones that need converting.
+
+    A source is pending when it is new or changed, its last conversion
+    failed, or its output has gone missing.
+    """
+    entries, pending = {}, []
+    for cname, files in found.items():
+        cat_slug = slugify(cname)
+        for idx, f in enumerate(files):
+            # Convert to jpg into uploads/kombi/<slug>/img-<n>.jpg
+            dst = KOMBI_DIR / cat_slug / f"img-{idx+1}.jpg"
+            stat = f.stat()
+            entry = {"dst": dst.relative_to(UPLOADS_DIR).as_posix(), "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+            key = f"{f}|{entry['dst']}"
+            previous = manifest.get(key)
+            unchanged = previous is not None and all(previous.get(k) == v for k, v in entry.items())
+            if unchanged and previous.get("ok") and dst.exists():
+                entries[key] = previous
+            else:
+                entries[key] = entry
+                pending.append((key, str(f), str(dst)))
+    return entries, pending
+
+
+def convert_pending(pending, jobs):
+    tasks = [(src, dst) for _, src, dst in pending]
+    if jobs <= 1 or len(tasks) <= 1:
+        return list(map(_convert_task, tasks))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(_convert_task, tasks, chunksize=max(1, len(tasks) // (jobs * 4))))
+
+
+def build_seeds(found, entries):
     categories_seed = []
     hero_seed = []
 
@@ -78,10 +163,8 @@ def build_seeds(found):
         # Pick first image as category cover
         cover_url = None
         for idx, f in enumerate(files):
-            # Convert to jpg into uploads/kombi/<slug>/img-<n>.jpg
-            dst = UPLOADS_DIR / "kombi" / cat_slug / f"img-{idx+1}.jpg"
-            ok = convert_to_jpg(Path(f), dst)
-            if not ok:
+            dst = f"kombi/{cat_slug}/img-{idx+1}.jpg"
+            if not entries[f"{f}|{dst}"].get("ok"):
                 continue
             url = f"/uploads/kombi/{cat_slug}/img-{idx+1}.jpg"
             if cover_url is None:
@@ -128,16 +211,38 @@ def build_seeds(found):
 
 
 def main():
-    ensure_dirs()
-    if not SRC_DIR.exists():
-        print(f"Source directory not found: {SRC_DIR}")
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--src", type=Path, default=SRC_DIR, help="source photo tree")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="conversion processes")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be converted and exit")
+    args = parser.parse_args()
+
+    if not args.src.exists():
+        print(f"Source directory not found: {args.src}")
         return
-    found = scan_categories()
+    found = scan_categories(args.src)
     if not found:
         print("No images found under source directory.")
         return
-    build_seeds(found)
+
+    entries, pending = plan_conversions(found, load_manifest())
+    total = len(entries)
+    print(f"{total} images found, {len(pending)} to convert, {total - len(pending)} unchanged.")
+    if args.dry_run:
+        for _, src, dst in pending:
+            print(f"  {src} -> {dst}")
+        return
+
+    ensure_dirs()
+    results = convert_pending(pending, args.jobs)
+    for (key, _, _), ok in zip(pending, results):
+        entries[key]["ok"] = ok
+    failed = sum(1 for ok in results if not ok)
+    if failed:
+        print(f"{failed} image(s) failed to convert; they are retried on the next run.")
+    save_manifest(entries)
+    build_seeds(found, entries)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
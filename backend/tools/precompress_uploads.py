@@ -0,0 +1,98 @@
+"""Write .gz (and .br, when the ``brotli`` package is installed) siblings for uploads.
+
+The /uploads mount serves these in place of the original when the client
+accepts the encoding. Only compressible types are processed, siblings that
+are already up to date are skipped, and a sibling that doesn't save at least
+``--min-saving`` of the original is removed rather than kept.
+
+    python tools/precompress_uploads.py [--dir DIR] [--min-saving 0.05] [--force] [--dry-run]
+"""
+import argparse
+import gzip
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from static_files import COMPRESSIBLE_SUFFIXES  # noqa: E402
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+UPLOADS_DIR = Path(__file__).resolve().parents[1] / "uploads"
+
+
+def _gzip(data: bytes) -> bytes:
+    # mtime=0 keeps the output byte-identical between runs
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _brotli(data: bytes) -> bytes:
+    return brotli.compress(data, quality=11)
+
+
+ENCODERS = [(".gz", _gzip)] + ([(".br", _brotli)] if brotli else [])
+
+
+def _write(dest: Path, data: bytes) -> None:
+    tmp = dest.with_name(f".tmp-{dest.name}")
+    tmp.write_bytes(data)
+    os.replace(tmp, dest)
+
+
+def precompress(root: Path, min_saving: float, force: bool, dry_run: bool) -> dict:
+    counts = {"written": 0, "fresh": 0, "skipped": 0, "saved_bytes": 0}
+    for dirpath, _, files in os.walk(root):
+        for name in files:
+            if not name.lower().endswith(COMPRESSIBLE_SUFFIXES):
+                continue
+            source = Path(dirpath) / name
+            source_stat = source.stat()
+            data = None
+            for suffix, encode in ENCODERS:
+                dest = source.with_name(name + suffix)
+                if not force and dest.exists() and dest.stat().st_mtime >= source_stat.st_mtime:
+                    counts["fresh"] += 1
+                    continue
+                if data is None:
+                    data = source.read_bytes()
+                encoded = encode(data)
+                saving = 1 - len(encoded) / max(1, len(data))
+                if saving < min_saving:
+                    counts["skipped"] += 1
+                    if not dry_run and dest.exists():
+                        dest.unlink()
+                    continue
+                counts["written"] += 1
+                counts["saved_bytes"] += len(data) - len(encoded)
+                print(f"{dest.relative_to(root)}: {len(data)} -> {len(encoded)} bytes ({saving:.0%} smaller)")
+                if not dry_run:
+                    _write(dest, encoded)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dir", type=Path, default=UPLOADS_DIR, help="tree to precompress")
+    parser.add_argument("--min-saving", type=float, default=0.05, help="minimum size reduction to keep a sibling")
+    parser.add_argument("--force", action="store_true", help="recompress even if siblings are up to date")
+    parser.add_argument("--dry-run", action="store_true", help="report without writing")
+    args = parser.parse_args()
+
+    if not args.dir.exists():
+        print(f"Directory not found: {args.dir}")
+        return
+    if brotli is None:
+        print("brotli not installed; writing .gz siblings only")
+    counts = precompress(args.dir, args.min_saving, args.force, args.dry_run)
+    print(
+        f"{counts['written']} written, {counts['fresh']} up to date, "
+        f"{counts['skipped']} not worth compressing, {counts['saved_bytes']} bytes saved."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""Bounded, streaming upload handling.
+
+Uploads are copied chunk by chunk into a temp file through a small thread
+pool, hashed on the way and capped in size, so neither worker RSS nor the
+event loop depends on how large the file is. The first bytes are sniffed to
+decide what the file really is; the finished temp file is renamed into place.
+
+Files larger than ``UPLOAD_RESUMABLE_THRESHOLD`` go through resumable
+sessions: the client creates a session, PUTs raw chunks at the current
+offset, and can ask for that offset after a dropped connection. Session
+state lives on disk so it survives restarts and is shared between workers.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, NamedTuple, Optional
+
+from fastapi import HTTPException, UploadFile
+
+UPLOAD_TMP_DIR = Path(__file__).parent / ".upload_tmp"
+
+UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", str(200 * 1024 * 1024)))
+# Single-request uploads above this size must use a resumable session
+UPLOAD_RESUMABLE_THRESHOLD = int(os.environ.get("UPLOAD_RESUMABLE_THRESHOLD", str(25 * 1024 * 1024)))
+
+_io_pool = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("UPLOAD_IO_WORKERS", "4")),
+    thread_name_prefix="upload-io",
+)
+
+# (magic bytes at offset, mime type); checked in order
+_SIGNATURES = (
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (0, b"II*\x00", "image/tiff"),
+    (0, b"MM\x00*", "image/tiff"),
+    (0, b"%PDF-", "application/pdf"),
+    (4, b"ftypavif", "image/avif"),
+    (4, b"ftypheic", "image/heic"),
+)
+
+ALLOWED_MIME_TYPES = {
+    "image/jpeg", "image/png", "image/gif", "image/tiff", "image/webp",
+    "image/avif", "image/heic", "application/pdf",
+}
+
+SNIFF_BYTES = 16
+
+
+def sniff_mime(head: bytes) -> Optional[str]:
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    for offset, magic, mime in _SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            return mime
+    return None
+
+
+class SpooledUpload(NamedTuple):
+    path: Path
+    size: int
+    digest: str
+    mime: str
+
+
+async def run_io(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_io_pool, fn, *args)
+
+
+def discard(path: Path) -> None:
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+async def spool(chunks: AsyncIterator[bytes], max_bytes: int) -> SpooledUpload:
+    """Copy ``chunks`` into a temp file; 413 past ``max_bytes``, 415 for unknown types"""
+    UPLOAD_TMP_DIR.mkdir(parents=True, exist_ok=True)
+    path = UPLOAD_TMP_DIR / f"{uuid.uuid4().hex}.spool"
+    hasher = hashlib.sha256()
+    size = 0
+    head = b""
+    f = await run_io(open, path, "wb")
+    try:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+            if len(head) < SNIFF_BYTES:
+                head += chunk[:SNIFF_BYTES - len(head)]
+                if len(head) >= SNIFF_BYTES and sniff_mime(head) not in ALLOWED_MIME_TYPES:
+                    raise HTTPException(status_code=415, detail="Unsupported file type")
+            hasher.update(chunk)
+            await run_io(f.write, chunk)
+    except BaseException:
+        await run_io(f.close)
+        await run_io(discard, path)
+        raise
+    await run_io(f.close)
+
+    mime = sniff_mime(head)
+    if mime not in ALLOWED_MIME_TYPES:
+        await run_io(discard, path)
+        raise HTTPException(status_code=415, detail="Unsupported file type")
+    return SpooledUpload(path=path, size=size, digest=hasher.hexdigest()[:32], mime=mime)
+
+
+async def upload_file_chunks(file: UploadFile) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+# Resumable sessions: <id>.json holds metadata, <id>.part the bytes so far
+
+def _session_paths(upload_id: str):
+    try:
+        uuid.UUID(hex=upload_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return UPLOAD_TMP_DIR / f"{upload_id}.json", UPLOAD_TMP_DIR / f"{upload_id}.part"
+
+
+def create_session(filename: str, size: int) -> dict:
+    if size <= 0 or size > UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload size must be between 1 and {UPLOAD_MAX_BYTES} bytes")
+    UPLOAD_TMP_DIR.mkdir(parents=True, exist_ok=True)
+    upload_id = uuid.uuid4().hex
+    meta_path, part_path = _session_paths(upload_id)
+    part_path.touch()
+    session = {"upload_id": upload_id, "filename": filename, "size": size}
+    meta_path.write_text(json.dumps(session), encoding="utf-8")
+    return {**session, "offset": 0, "chunk_size": UPLOAD_CHUNK_SIZE}
+
+
+def get_session(upload_id: str) -> dict:
+    meta_path, part_path = _session_paths(upload_id)
+    if not meta_path.exists() or not part_path.exists():
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    session = json.loads(meta_path.read_text(encoding="utf-8"))
+    return {**session, "offset": part_path.stat().st_size, "chunk_size": UPLOAD_CHUNK_SIZE}
+
+
+async def append_chunk(upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> dict:
+    """Append a request body at ``offset``; 409 when it doesn't match the stored size"""
+    session = await run_io(get_session, upload_id)
+    if offset != session["offset"]:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Offset mismatch: expected {session['offset']}",
+            headers={"Upload-Offset": str(session["offset"])},
+        )
+    _, part_path = _session_paths(upload_id)
+    remaining = session["size"] - offset
+    written = 0
+    f = await run_io(open, part_path, "ab")
+    try:
+        async for chunk in chunks:
+            written += len(chunk)
+            if written > remaining:
+                # Drop the overflowing chunk so the session stays resumable
+                await run_io(f.truncate, offset + written - len(chunk))
+                raise HTTPException(status_code=413, detail="Chunk exceeds declared upload size")
+            await run_io(f.write, chunk)
+    finally:
+        await run_io(f.close)
+    return {**session, "offset": offset + written}
+
+
+def _hash_file(path: Path):
+    hasher = hashlib.sha256()
+    head = b""
+    with open(path, "rb") as f:
+        while chunk := f.read(UPLOAD_CHUNK_SIZE):
+            if not head:
+                head = chunk[:SNIFF_BYTES]
+            hasher.update(chunk)
+    return hasher.hexdigest()[:32], head
+
+
+async def finish_session(upload_id: str) -> SpooledUpload:
+    """Turn a completed session into a spooled upload and drop its metadata"""
+    session = await run_io(get_session, upload_id)
+    if session["offset"] != session["size"]:
+        raise HTTPException(status_code=409, detail="Upload is not complete")
+    meta_path, part_path = _session_paths(upload_id)
+    digest, head = await run_io(_hash_file, part_path)
+    mime = sniff_mime(head)
+    await run_io(discard, meta_path)
+    if mime not in ALLOWED_MIME_TYPES:
+        await run_io(discard, part_path)
+        raise HTTPException(status_code=415, detail="Unsupported file type")
+    return SpooledUpload(path=part_path, size=session["size"], digest=digest, mime=mime)
+
+
+def cancel_session(upload_id: str) -> None:
+    meta_path, part_path = _session_paths(upload_id)
+    if not meta_path.exists():
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    discard(part_path)
+    discard(meta_path)
+
+
+def move_into_place(src: Path, dest: Path) -> None:
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.replace(src, dest)
+    except OSError:
+        # Different filesystem: copy next to the target, then rename atomically
+        tmp = dest.with_name(f".tmp-{dest.name}")
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dest)
+        discard(src)
@@ -0,0 +1,253 @@
+"""Write-behind batching for high-volume public inserts (contact forms, reviews).
+
+Routes ``put`` documents and return immediately; a background task writes
+them with one ``insert_many`` per collection once ``WRITE_BEHIND_BATCH_SIZE``
+documents are waiting or ``WRITE_BEHIND_FLUSH_INTERVAL`` seconds have passed.
+
+When MongoDB rejects a batch (offline, timeouts) the documents are appended
+to a local JSON-lines journal instead of being dropped, and the journal is
+replayed every ``WRITE_BEHIND_RETRY_INTERVAL`` seconds until the database
+accepts it. Replays upsert by the document's ``id`` (its ``_id`` is fixed on
+``put`` too), so a batch that was partly written before failing, or a
+replay interrupted before the journal was removed, is not duplicated.
+Shutdown drains the queue the same way.
+
+Every worker process shares the journal directory: appends and the
+rotation to ``journal.replaying.jsonl`` hold an exclusive ``flock`` on
+``journal.lock``, and a replay holds ``journal.replay.lock`` for its whole
+run, so only one process replays at a time.
+
+Listeners registered with ``subscribe`` run after documents reach MongoDB
+(e.g. to invalidate a cache or bump counters), once per document. A
+document is only journaled before it has been announced, including when a
+failed ``insert_many`` had in fact written part of the batch, so a replay
+announces every journaled document it writes, whether its upsert created
+the document or matched one already there. Documents are announced when
+the whole journal has been written, so a replay that fails halfway and is
+retried announces nothing twice. A crash between removing the journal and
+notifying loses those announcements; rebuild derived data (e.g.
+``review_stats``) after one.
+"""
+import asyncio
+import fcntl
+import logging
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterator, List, Tuple
+
+from bson import ObjectId, json_util
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+
+from database import db
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent
+WRITE_BEHIND_BATCH_SIZE = int(os.environ.get("WRITE_BEHIND_BATCH_SIZE", "100"))
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.environ.get("WRITE_BEHIND_FLUSH_INTERVAL", "0.5"))
+WRITE_BEHIND_RETRY_INTERVAL = float(os.environ.get("WRITE_BEHIND_RETRY_INTERVAL", "5"))
+# Past this many waiting documents, new ones go straight to the journal
+WRITE_BEHIND_MAX_PENDING = int(os.environ.get("WRITE_BEHIND_MAX_PENDING", "10000"))
+WRITE_BEHIND_JOURNAL_DIR = Path(os.environ.get("WRITE_BEHIND_JOURNAL_DIR", ROOT_DIR / ".write_journal"))
+
+DUPLICATE_KEY = 11000
+
+Listener = Callable[[List[dict]], Awaitable[None]]
+
+
+@contextmanager
+def _flock(path: Path, blocking: bool = True) -> Iterator[bool]:
+    """Exclusive lock on ``path`` across processes; yields False if ``blocking`` is off and it is taken"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _append_lines(path: Path, lock: Path, lines: List[str]) -> None:
+    with _flock(lock):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _rotate(path: Path, replaying: Path, lock: Path) -> bool:
+    """Move the journal aside for replay; an earlier unfinished replay file is retried first"""
+    if replaying.exists():
+        return True
+    with _flock(lock):
+        if not path.exists():
+            return False
+        os.replace(path, replaying)
+    return True
+
+
+def _upsert(doc: dict) -> ReplaceOne:
+    key = {"id": doc["id"]} if "id" in doc else {"_id": doc["_id"]}
+    return ReplaceOne(key, doc, upsert=True)
+
+
+def _read_entries(path: Path) -> List[Tuple[str, dict]]:
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json_util.loads(line)
+            except ValueError:
+                # A torn last line from a crash mid-append
+                logger.warning(f"Skipping unreadable journal line in {path.name}")
+                continue
+            entries.append((entry["collection"], entry["doc"]))
+    return entries
+
+
+class WriteBehindQueue:
+    def __init__(self, database, journal_dir: Path = WRITE_BEHIND_JOURNAL_DIR):
+        self.db = database
+        self.journal = journal_dir / "journal.jsonl"
+        # Being replayed; survives a failed replay so nothing is lost
+        self.replaying = journal_dir / "journal.replaying.jsonl"
+        self.lock = journal_dir / "journal.lock"
+        self.replay_lock = journal_dir / "journal.replay.lock"
+        self._pending: List[Tuple[str, dict]] = []
+        self._wakeup = asyncio.Event()
+        self._listeners: Dict[str, List[Listener]] = defaultdict(list)
+        self._task = None
+        self._next_replay = 0.0
+        self.stats = {"queued": 0, "written": 0, "journaled": 0, "replayed": 0, "failed_flushes": 0}
+
+    def subscribe(self, collection: str, listener: Listener) -> None:
+        self._listeners[collection].append(listener)
+
+    def status(self) -> dict:
+        journaled = sum(1 for path in (self.journal, self.replaying) if path.exists())
+        return {**self.stats, "pending": len(self._pending), "journal_files": journaled}
+
+    async def put(self, collection: str, doc: dict) -> None:
+        doc.setdefault("_id", ObjectId())
+        self.stats["queued"] += 1
+        if len(self._pending) >= WRITE_BEHIND_MAX_PENDING:
+            await self._spill([(collection, doc)])
+            return
+        self._pending.append((collection, doc))
+        if len(self._pending) >= WRITE_BEHIND_BATCH_SIZE:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task and drain (to MongoDB or the journal)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), WRITE_BEHIND_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+                if time.monotonic() >= self._next_replay:
+                    await self.replay()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Write-behind flush failed: {e}")
+
+    async def flush(self) -> None:
+        while self._pending:
+            batch = self._pending[:WRITE_BEHIND_BATCH_SIZE]
+            del self._pending[:WRITE_BEHIND_BATCH_SIZE]
+            groups: Dict[str, List[dict]] = defaultdict(list)
+            for collection, doc in batch:
+                groups[collection].append(doc)
+            for collection, docs in groups.items():
+                await self._insert(collection, docs)
+
+    async def _insert(self, collection: str, docs: List[dict]) -> None:
+        try:
+            await self.db[collection].insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            # Duplicates were already written (e.g. by a replay); anything else goes to the journal
+            failed = {err["index"] for err in e.details.get("writeErrors", []) if err.get("code") != DUPLICATE_KEY}
+            if failed:
+                await self._spill([(collection, docs[i]) for i in sorted(failed)])
+            docs = [doc for i, doc in enumerate(docs) if i not in failed]
+        except Exception as e:
+            self.stats["failed_flushes"] += 1
+            logger.warning(f"Could not write {len(docs)} {collection} document(s), journaling: {e}")
+            await self._spill([(collection, doc) for doc in docs])
+            return
+        self.stats["written"] += len(docs)
+        await self._notify(collection, docs)
+
+    async def _spill(self, entries: List[Tuple[str, dict]]) -> None:
+        lines = [json_util.dumps({"collection": c, "doc": d}) + "\n" for c, d in entries]
+        await asyncio.to_thread(_append_lines, self.journal, self.lock, lines)
+        self.stats["journaled"] += len(entries)
+        # Give MongoDB a moment before trying the journal again
+        self._next_replay = time.monotonic() + WRITE_BEHIND_RETRY_INTERVAL
+
+    async def replay(self) -> int:
+        """Upsert journaled documents; the journal is removed only once all are written"""
+        with _flock(self.replay_lock, blocking=False) as locked:
+            if not locked:
+                # Another worker is replaying the shared journal
+                return 0
+            if not await asyncio.to_thread(_rotate, self.journal, self.replaying, self.lock):
+                return 0
+            entries = await asyncio.to_thread(_read_entries, self.replaying)
+            groups: Dict[str, List[dict]] = defaultdict(list)
+            for collection, doc in entries:
+                groups[collection].append(doc)
+            try:
+                for collection, docs in groups.items():
+                    for start in range(0, len(docs), WRITE_BEHIND_BATCH_SIZE):
+                        chunk = docs[start:start + WRITE_BEHIND_BATCH_SIZE]
+                        await self.db[collection].bulk_write([_upsert(doc) for doc in chunk], ordered=False)
+            except Exception as e:
+                # Nothing announced yet: the retry announces the whole journal once
+                self._next_replay = time.monotonic() + WRITE_BEHIND_RETRY_INTERVAL
+                logger.warning(f"Journal replay deferred ({len(entries)} document(s)): {e}")
+                return 0
+            self.replaying.unlink()
+        self.stats["replayed"] += len(entries)
+        logger.info(f"Replayed {len(entries)} journaled document(s)")
+        for collection, docs in groups.items():
+            await self._notify(collection, docs)
+        return len(entries)
+
+    async def _notify(self, collection: str, docs: List[dict]) -> None:
+        for listener in self._listeners.get(collection, ()):
+            try:
+                await listener(docs)
+            except Exception as e:
+                logger.warning(f"Write-behind listener for {collection} failed: {e}")
+
+
+write_queue = WriteBehindQueue(db)
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from mongomock_motor import AsyncMongoMockClient
+
+import admin_users
+import database
+from auth import current_user, require_admin, require_editor
+
+
+@pytest.fixture
+def users(monkeypatch):
+    db = AsyncMongoMockClient()["test"]
+    monkeypatch.setattr(database, "db", db)
+    monkeypatch.setattr(admin_users, "_users", {})
+    asyncio.run(db.admin_users.insert_one({"username": "ed", "role": "editor", "password_hash": "x"}))
+    return db
+
+
+def _status(check, token):
+    async def run():
+        # As FastAPI resolves the dependency chain
+        return await check(await current_user(token))
+
+    try:
+        asyncio.run(run())
+    except HTTPException as e:
+        return e.status_code
+    return 200
+
+
+def test_role_comes_from_the_stored_user_not_the_token(users):
+    # A token still claiming admin after the user was demoted to editor
+    token = {"sub": "ed", "role": "admin"}
+    assert _status(require_admin, token) == 403
+    assert _status(require_editor, token) == 200
+
+
+def test_deleted_or_demoted_users_lose_access_after_the_cache(users):
+    token = {"sub": "ed", "role": "editor"}
+    assert _status(require_editor, token) == 200
+    asyncio.run(admin_users.update_user(users, "ed", role="viewer"))
+    assert _status(require_editor, token) == 403
+    asyncio.run(admin_users.delete_user(users, "ed"))
+    assert _status(require_editor, token) == 401
@@ -0,0 +1,89 @@
+import asyncio
+from datetime import datetime
+
+from mongomock_motor import AsyncMongoMockClient
+
+from bulk_import import ImportJob, run_import
+from export import csv_chunks
+
+PRODUCT = {
+    "id": "p1",
+    "name": {"tr": "Kombi", "en": "Combi", "ru": "", "it": ""},
+    "description": {"tr": "Yoğuşmalı", "en": "Condensing", "ru": "", "it": ""},
+    "category": "combi",
+    "images": ["/uploads/a.jpg", "/uploads/b.jpg"],
+    "models": [{"model_name": "M24", "technical_specs": {"efficiency": "92%"}, "components": {"pump": "Wilo"}}],
+    "price": 1000.0,
+    "created_at": datetime(2024, 1, 1),
+}
+
+
+async def _export_csv(db) -> bytes:
+    async def products():
+        async for product in db.products.find({}):
+            yield product
+    return b"".join([chunk async for chunk in csv_chunks(products())])
+
+
+async def _import(db, data: bytes) -> ImportJob:
+    job = ImportJob(format="csv")
+    await run_import(db, job, data)
+    assert job.status == "completed", job.detail
+    return job
+
+
+def _stored(db):
+    return asyncio.run(db.products.find_one({"id": "p1"}, {"_id": 0}))
+
+
+def _db():
+    db = AsyncMongoMockClient()["test"]
+    asyncio.run(db.products.insert_one(dict(PRODUCT)))
+    return db
+
+
+def test_csv_export_import_round_trip_is_lossless():
+    db = _db()
+
+    async def round_trip():
+        job = await _import(db, await _export_csv(db))
+        assert job.updated == 1 and job.failed == 0
+
+    asyncio.run(round_trip())
+    stored = _stored(db)
+    for field in ("name", "description", "category", "images", "price", "created_at"):
+        assert stored[field] == PRODUCT[field], field
+    model = stored["models"][0]
+    assert model["model_name"] == "M24"
+    assert model["technical_specs"]["efficiency"] == "92%"
+    assert model["components"]["pump"] == "Wilo"
+
+
+def test_csv_without_optional_columns_keeps_stored_values():
+    db = _db()
+    data = "product_id,category,name_tr,model_name,efficiency\np1,premix,Yeni Kombi,M24,94%\n".encode()
+    asyncio.run(_import(db, data))
+    stored = _stored(db)
+    assert stored["category"] == "premix"
+    assert stored["name"]["tr"] == "Yeni Kombi"
+    assert stored["models"][0]["technical_specs"]["efficiency"] == "94%"
+    assert stored["description"] == PRODUCT["description"]
+    assert stored["images"] == PRODUCT["images"]
+    assert stored["name"] == {**PRODUCT["name"], "tr": "Yeni Kombi"}
+
+
+def test_csv_without_model_columns_keeps_names_and_models():
+    db = _db()
+    asyncio.run(_import(db, "product_id,category,name_tr\np1,premix,Yeni\n".encode()))
+    stored = _stored(db)
+    assert stored["name"] == {**PRODUCT["name"], "tr": "Yeni"}
+    assert stored["models"][0]["model_name"] == "M24"
+    assert stored["description"] == PRODUCT["description"]
+
+
+def test_new_product_from_partial_csv_gets_defaults():
+    db = AsyncMongoMockClient()["test"]
+    asyncio.run(_import(db, "product_id,category,name_tr\np9,combi,Kombi 9\n".encode()))
+    stored = asyncio.run(db.products.find_one({"id": "p9"}))
+    assert stored["description"] == "" and stored["images"] == [] and stored["created_at"]
+    assert stored["name"] == {"tr": "Kombi 9", "en": "", "ru": "", "it": ""} and stored["models"] == []
@@ -0,0 +1,47 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from compression import CompressionMiddleware
+from http_cache import conditional_response, render_json
+
+
+def _client(payload):
+    app = FastAPI()
+
+    @app.get("/api/things")
+    async def things(request: Request):
+        return conditional_response(request, render_json(payload))
+
+    app.add_middleware(CompressionMiddleware)
+    return TestClient(app)
+
+
+LARGE = [{"id": i, "text": "condensing boiler " * 5} for i in range(200)]
+SMALL = {"ok": True}
+
+
+@pytest.mark.parametrize("payload", [LARGE, SMALL])
+@pytest.mark.parametrize("accept_encoding", ["gzip", "identity"])
+def test_200_and_304_share_validator_and_vary(payload, accept_encoding):
+    client = _client(payload)
+    headers = {"Accept-Encoding": accept_encoding}
+    first = client.get("/api/things", headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert etag.startswith('W/"')
+    assert "Accept-Encoding" in first.headers["vary"]
+
+    revalidated = client.get("/api/things", headers={**headers, "If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == etag
+    assert "Accept-Encoding" in revalidated.headers["vary"]
+
+
+def test_large_body_is_compressed_only_when_accepted():
+    client = _client(LARGE)
+    compressed = client.get("/api/things", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    identity = client.get("/api/things", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+    assert compressed.json() == identity.json()
@@ -0,0 +1,67 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+import images
+from image_transforms import DiskLRU
+
+
+def _png(im: Image.Image) -> bytes:
+    out = BytesIO()
+    im.save(out, format="PNG")
+    return out.getvalue()
+
+
+def _transparent_rgba():
+    im = Image.new("RGBA", (400, 200), (0, 0, 0, 0))
+    im.paste((255, 0, 0, 255), (0, 0, 200, 200))
+    return im
+
+
+def _transparent_palette():
+    im = _transparent_rgba().convert("RGB").quantize(colors=4)
+    im.info["transparency"] = im.getpixel((300, 100))
+    return im
+
+
+@pytest.fixture
+def images_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(images, "IMAGES_DIR", tmp_path)
+    return tmp_path
+
+
+@pytest.mark.parametrize("source", [_transparent_rgba, _transparent_palette])
+def test_transparency_survives_webp_and_flattens_to_white_for_jpeg(images_dir, source):
+    manifest = images.build_derivatives(_png(source()), "digest")
+    largest = manifest["variants"][-1]["width"]
+
+    if "webp" in images.IMAGE_FORMATS:
+        with Image.open(images_dir / "digest" / f"{largest}.webp") as webp:
+            assert webp.mode == "RGBA"
+            assert webp.getpixel((largest - 1, 0))[3] == 0
+            assert webp.getpixel((0, 0))[3] == 255
+
+    with Image.open(images_dir / "digest" / f"{largest}.jpg") as jpeg:
+        assert jpeg.mode == "RGB"
+        assert all(channel > 245 for channel in jpeg.getpixel((largest - 5, 5)))
+        red, green, blue = jpeg.getpixel((5, 5))
+        assert red > 240 and green < 15 and blue < 15
+
+
+def test_opaque_images_keep_their_mode():
+    assert images.normalize_mode(Image.new("RGB", (4, 4))).mode == "RGB"
+    assert images.normalize_mode(Image.new("L", (4, 4))).mode == "L"
+    assert images.normalize_mode(Image.new("CMYK", (4, 4))).mode == "RGB"
+    assert images.normalize_mode(Image.new("LA", (4, 4))).mode == "RGBA"
+
+
+def test_disk_cache_treats_files_deleted_by_another_worker_as_misses(tmp_path):
+    cache = DiskLRU(tmp_path, max_bytes=1000)
+    cache.load()
+    cache.write("ab1.jpg", b"x" * 10)
+    cache.add("ab1.jpg", 10)
+    assert cache.get("ab1.jpg") == cache.path("ab1.jpg")
+    cache.path("ab1.jpg").unlink()
+    assert cache.get("ab1.jpg") is None
+    assert cache.stats()["entries"] == 0 and cache.stats()["bytes"] == 0
@@ -0,0 +1,73 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+from mongomock_motor import AsyncMongoMockClient
+
+from pagination import after_cursor, decode_cursor, encode_cursor, fetch_page
+
+
+@pytest.mark.parametrize("sort_value", [
+    datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc),
+    datetime(2024, 5, 1, 12, 30),
+    42,
+    "kombi",
+    None,
+])
+def test_cursor_round_trip(sort_value):
+    cursor = encode_cursor(sort_value, "product-7")
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (sort_value, "product-7")
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not base64!",
+    "e30",  # {}
+    "eyJrIjp7fX0",  # {"k":{}}
+    "W10",  # []
+])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as excinfo:
+        decode_cursor(cursor)
+    assert excinfo.value.status_code == 400
+
+
+def test_malformed_cursor_is_rejected_before_querying():
+    with pytest.raises(HTTPException):
+        after_cursor("created_at", "garbage")
+
+
+def _page_through(docs, limit):
+    async def run():
+        collection = AsyncMongoMockClient()["test"]["products"]
+        await collection.insert_many(docs)
+        seen, after = [], None
+        while True:
+            page = await fetch_page(collection, {}, "created_at", limit, after, {"_id": 0})
+            seen.extend(doc["id"] for doc in page["items"])
+            assert page["total"] == len(docs)
+            if not page["has_more"]:
+                return seen
+            after = after_cursor("created_at", page["next_cursor"])
+    return asyncio.run(run())
+
+
+def test_equal_sort_keys_are_split_by_id():
+    same = datetime(2024, 1, 1)
+    docs = [{"id": f"p{i}", "created_at": same} for i in range(7)]
+    docs.append({"id": "newest", "created_at": datetime(2024, 2, 1)})
+    # Page boundaries fall inside the run of equal timestamps
+    seen = _page_through(docs, limit=3)
+    assert seen == ["newest"] + [f"p{i}" for i in range(6, -1, -1)]
+
+
+def test_missing_sort_keys_come_last_without_repeats():
+    docs = [
+        {"id": "a", "created_at": datetime(2024, 1, 1)},
+        {"id": "b", "created_at": None},
+        {"id": "c", "created_at": None},
+        {"id": "d", "created_at": datetime(2024, 3, 1)},
+    ]
+    assert _page_through(docs, limit=1) == ["d", "a", "c", "b"]
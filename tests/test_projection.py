@@ -0,0 +1,55 @@
+import pytest
+
+from i18n import resolve_text
+from projection import localized, product_projection
+
+NAMES = [
+    {"tr": "Kombi", "en": "Combi", "ru": "", "it": "Caldaia"},
+    {"tr": "", "en": "Combi", "ru": "", "it": ""},
+    {"tr": "", "en": "", "ru": "", "it": "Caldaia"},
+    {"it": "Caldaia"},
+    {"tr": "", "en": "", "ru": "", "it": ""},
+    "Legacy name",
+]
+
+_MISSING = object()
+_TYPES = {dict: "object", str: "string"}
+
+
+def _evaluate(expression, doc):
+    """The aggregation operators ``localized`` uses; mongomock has no ``$type``"""
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = doc
+        for part in expression[1:].split("."):
+            value = value.get(part, _MISSING) if isinstance(value, dict) else _MISSING
+        return value
+    if not isinstance(expression, dict):
+        return expression
+    (operator, args), = expression.items()
+    if operator == "$type":
+        value = _evaluate(args, doc)
+        return "missing" if value is _MISSING else _TYPES.get(type(value), "other")
+    values = [_evaluate(arg, doc) for arg in args]
+    if operator == "$cond":
+        return _evaluate(args[1], doc) if values[0] else _evaluate(args[2], doc)
+    return {
+        "$eq": lambda: values[0] == values[1],
+        "$ne": lambda: values[0] != values[1],
+        "$and": lambda: all(values),
+    }[operator]()
+
+
+@pytest.mark.parametrize("lang", ["tr", "en", "ru", "it"])
+def test_localized_resolves_like_resolve_text(lang):
+    expression = localized("name", lang)
+    assert [_evaluate(expression, {"name": name}) for name in NAMES] == [resolve_text(name, lang) for name in NAMES]
+
+
+def test_text_only_in_italian_reaches_turkish_lists():
+    assert _evaluate(localized("name", "tr"), {"name": NAMES[2]}) == "Caldaia"
+
+
+def test_lang_narrows_projected_fields():
+    projection = product_projection("id,name", "en")
+    assert projection["name"] == localized("name", "en")
+    assert product_projection("id,name", None) == {"_id": 0, "id": 1, "name": 1}
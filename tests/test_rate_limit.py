@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+import rate_limit
+from rate_limit import MemoryBackend, RateLimitMiddleware, RateLimitRule
+
+RULE = RateLimitRule("test", "POST", "/api/login", rate=0.5, burst=2)
+
+
+def test_bucket_refills_at_rate():
+    backend = MemoryBackend()
+
+    async def run():
+        waits = [await backend.take("k", RULE, now) for now in (0, 0, 0)]
+        # One token back after 2 s at 0.5/s
+        waits.append(await backend.take("k", RULE, 2.0))
+        waits.append(await backend.take("k", RULE, 2.5))
+        # Refill is capped at burst however long the bucket sat idle
+        waits += [await backend.take("k", RULE, 1000.0) for _ in range(3)]
+        return waits
+
+    waits = asyncio.run(run())
+    assert waits[:2] == [0, 0]
+    assert waits[2] == pytest.approx(2.0)
+    assert waits[3] == 0
+    assert waits[4] == pytest.approx(1.5)
+    assert waits[5:7] == [0, 0] and waits[7] > 0
+
+
+def test_buckets_are_per_key_and_evicted_lru():
+    backend = MemoryBackend(max_keys=2)
+
+    async def run():
+        for key in ("a", "a", "b"):
+            await backend.take(key, RULE, 0)
+        assert await backend.take("a", RULE, 0) > 0
+        await backend.take("c", RULE, 0)  # evicts "b", the least recently used
+        return list(backend._buckets)
+
+    assert asyncio.run(run()) == ["a", "c"]
+
+
+async def _request(app, ip, path="/api/login"):
+    scope = {"type": "http", "method": "POST", "path": path, "headers": [], "client": (ip, 50000)}
+    result = {}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+            result["headers"] = dict(message["headers"])
+
+    await app(scope, receive, send)
+    return result
+
+
+async def _ok(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def test_middleware_429_retry_after(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: clock[0])
+    slow = RateLimitRule("slow", "POST", "/api/login", rate=1 / 60, burst=1)
+    app = RateLimitMiddleware(_ok, rules=(slow,))
+
+    async def run():
+        results = [await _request(app, "10.0.0.1"), await _request(app, "10.0.0.1")]
+        clock[0] += 30.4
+        results.append(await _request(app, "10.0.0.1"))
+        results.append(await _request(app, "10.0.0.2"))
+        results.append(await _request(app, "10.0.0.1", path="/api/products"))
+        clock[0] += 30
+        results.append(await _request(app, "10.0.0.1"))
+        return results
+
+    first, limited, later, other_ip, unmatched, refilled = asyncio.run(run())
+    assert first["status"] == 200
+    assert limited["status"] == 429 and limited["headers"][b"retry-after"] == b"60"
+    # Rounded up to whole seconds: 29.6 s left
+    assert later["status"] == 429 and later["headers"][b"retry-after"] == b"30"
+    assert other_ip["status"] == 200
+    assert unmatched["status"] == 200
+    assert refilled["status"] == 200
+
+
+def test_middleware_sub_second_wait_retries_after_one_second(monkeypatch):
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: 0.0)
+    fast = RateLimitRule("fast", "POST", "/api/login", rate=10, burst=1, per_ip=False)
+    app = RateLimitMiddleware(_ok, rules=(fast,))
+
+    async def run():
+        return [await _request(app, f"10.0.0.{i}") for i in range(2)]
+
+    allowed, limited = asyncio.run(run())
+    assert allowed["status"] == 200
+    assert limited["status"] == 429 and limited["headers"][b"retry-after"] == b"1"
+
+
+def test_spoofed_forwarded_for_shares_the_proxy_seen_bucket(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_TRUST_PROXY", True)
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_PROXY_HOPS", 1)
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: 0.0)
+    app = RateLimitMiddleware(_ok, rules=(RateLimitRule("login", "POST", "/api/login", rate=1 / 60, burst=1),))
+
+    async def attempt(spoofed):
+        scope = {
+            "type": "http", "method": "POST", "path": "/api/login", "client": ("10.0.0.254", 443),
+            "headers": [(b"x-forwarded-for", f"{spoofed}, 198.51.100.7".encode())],
+        }
+        statuses = []
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                statuses.append(message["status"])
+
+        await app(scope, None, send)
+        return statuses[0]
+
+    async def run():
+        return [await attempt(f"203.0.113.{i}") for i in range(3)]
+
+    assert rate_limit.client_ip({"headers": [(b"x-forwarded-for", b"1.2.3.4, 198.51.100.7")]}) == "198.51.100.7"
+    assert asyncio.run(run()) == [200, 429, 429]
@@ -0,0 +1,43 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from review_stats import load_summary, rebuild_review_stats, review_deleted, review_updated, reviews_created
+
+REVIEWS = [
+    {"id": "r1", "name": "A", "city": "İzmir", "rating": 5, "text": "", "product_id": "p1"},
+    {"id": "r2", "name": "B", "city": "izmir ", "rating": 3, "text": "", "product_id": "p1"},
+    {"id": "r3", "name": "C", "city": "Ankara", "rating": 4, "text": "", "product_id": "p2"},
+    {"id": "r4", "name": "D", "city": "Ankara", "rating": 2, "text": ""},
+]
+
+
+def _summary(summary):
+    return {
+        "all": (summary.count, summary.average),
+        "products": {p.product_id: (p.count, p.average, p.distribution["5"]) for p in summary.products},
+        "cities": {c.city: (c.count, c.average) for c in summary.cities},
+    }
+
+
+def test_incremental_counters_match_rebuild():
+    async def run():
+        db = AsyncMongoMockClient()["test"]
+        await db.reviews.insert_many([dict(review) for review in REVIEWS])
+        await reviews_created(db, REVIEWS)
+        # Moved to another product with a new rating, then one deleted
+        moved = {**REVIEWS[2], "product_id": "p1", "rating": 5}
+        await db.reviews.replace_one({"id": "r3"}, moved)
+        await review_updated(db, REVIEWS[2], moved)
+        await db.reviews.delete_one({"id": "r4"})
+        await review_deleted(db, REVIEWS[3])
+        incremental = _summary(await load_summary(db))
+        await rebuild_review_stats(db)
+        return incremental, _summary(await load_summary(db))
+
+    incremental, rebuilt = asyncio.run(run())
+    assert incremental["all"] == (3, 4.33)
+    assert incremental["products"] == {"p1": (3, 4.33, 2)}
+    # "İzmir" and "izmir " are one city, shown with the latest spelling
+    assert incremental["cities"] == {"izmir": (2, 4.0), "Ankara": (1, 5.0)}
+    assert incremental == rebuilt
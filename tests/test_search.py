@@ -0,0 +1,75 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from search import SearchIndex, fold, tokenize
+
+PRODUCTS = [
+    {"id": "p1", "name": {"tr": "Isıtma Kombisi", "en": "Heating Combi"}, "category": "combi",
+     "models": [{"model_name": "Premix 24", "technical_specs": {"efficiency": "%92,5"}}]},
+    {"id": "p2", "name": {"tr": "Şofben", "en": "Water Heater"}, "category": "heater",
+     "description": {"tr": "Hızlı ısıtma"}},
+    {"id": "p3", "name": "İSTANBUL Radyatör", "category": "radiator"},
+]
+
+
+def _index():
+    index = SearchIndex()
+    for product in PRODUCTS:
+        index.add(product)
+    return index
+
+
+def test_fold_turkish_case_and_accents():
+    assert fold("ISITMA") == fold("ısıtma") == fold("Isıtma") == "isitma"
+    assert fold("İstanbul") == "istanbul"
+    assert fold("Şofben Ğ Ç Ö Ü") == "sofben g c o u"
+    assert fold("Café") == "cafe"
+    assert tokenize("%92,5 verim") == ["92.5", "verim"]
+
+
+def test_accent_and_case_insensitive_matching():
+    index = _index()
+    assert index.search("ISITMA") == index.search("isitma") == index.search("ısıtma")
+    assert index.search("istanbul") == ["p3"]
+    assert index.search("sofben") == ["p2"]
+
+
+def test_prefix_matching():
+    index = _index()
+    assert index.search("kom") == ["p1"]
+    assert index.search("radya") == ["p3"]
+    assert index.search("92.5") == ["p1"]
+    # Single characters only match whole terms
+    assert index.search("k") == []
+
+
+def test_all_terms_must_match_and_exact_terms_rank_first():
+    index = _index()
+    assert set(index.search("isitma")) == {"p1", "p2"}
+    assert index.search("isitma premix") == ["p1"]
+    assert index.search("isitma nothing") == []
+    # p1 has "isitma" in its name, p2 only in the description
+    assert index.search("isitma") == ["p1", "p2"]
+    # A prefix hit ("isitmali") in the name ranks below the exact term in the name
+    index.add({"id": "p4", "name": "Isıtmalı Havlupan"})
+    ranked = index.search("isitma")
+    assert ranked.index("p1") < ranked.index("p4")
+
+
+def test_remove_and_rebuild_keep_the_vocabulary_sorted():
+    index = _index()
+    index.remove("p1")
+    assert index.search("kombi") == []
+    assert index._vocabulary == sorted(index._vocabulary)
+
+    async def rebuild():
+        db = AsyncMongoMockClient()["test"]
+        await db.products.insert_many([dict(product) for product in PRODUCTS])
+        rebuilt = SearchIndex()
+        await rebuilt.rebuild(db)
+        return rebuilt
+
+    rebuilt = asyncio.run(rebuild())
+    assert rebuilt._vocabulary == sorted(_index()._vocabulary)
+    assert rebuilt.search("premix 24") == ["p1"]
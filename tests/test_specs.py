@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from mongomock_motor import AsyncMongoMockClient
+
+from specs import (
+    energy_class_rank,
+    facet_pipeline,
+    model_specs,
+    normalize_energy_class,
+    parse_dimensions,
+    parse_quantity,
+    shape_facets,
+    spec_filter,
+)
+
+
+@pytest.mark.parametrize("value, unit, expected", [
+    ("3.5 kW", "kW", 3.5),
+    ("3,5 kW", "kW", 3.5),
+    ("24kw", "kW", 24.0),
+    ("3500 W", "kW", 3.5),
+    ("20640 kcal/h", "kW", 24.0),
+    ("102%", "%", 102.0),
+    ("92 %", "%", 92.0),
+    ("0.37 m³/h", "l/min", 6.167),
+    ("0.37 m3/h", "l/min", 6.167),
+    ("13,8 lt/dk", "l/min", 13.8),
+    ("36 kg", "kg", 36.0),
+    (24, "kW", 24.0),
+])
+def test_parse_quantity_units(value, unit, expected):
+    assert parse_quantity(value, unit) == expected
+
+
+def test_parse_quantity_ranges():
+    assert parse_quantity("9.4-24 kW", "kW") == 9.4
+    assert parse_quantity("9.4-24 kW", "kW", last=True) == 24.0
+    assert parse_quantity("9,4 - 24 kW", "kW") == 9.4
+
+
+@pytest.mark.parametrize("value", [None, "", "   ", "-", "n/a"])
+def test_parse_quantity_blank(value):
+    assert parse_quantity(value, "kW") is None
+
+
+def test_parse_quantity_unknown_unit():
+    assert parse_quantity("24 bar", "kW") is None
+
+
+def test_parse_dimensions():
+    assert parse_dimensions("710 x 410 x 260 mm") == [710.0, 410.0, 260.0]
+    assert parse_dimensions("71 x 41 x 26 cm") == [710.0, 410.0, 260.0]
+    assert parse_dimensions("710x410x260") == [710.0, 410.0, 260.0]
+    assert parse_dimensions("") is None
+    assert parse_dimensions(None) is None
+
+
+def test_energy_class():
+    assert normalize_energy_class(" a++ ") == "A++"
+    assert normalize_energy_class("A++++") is None
+    assert normalize_energy_class("H") is None
+    ranked = sorted(["B", "A", "A+++", "A+"], key=energy_class_rank)
+    assert ranked == ["A+++", "A+", "A", "B"]
+
+
+def test_model_specs_single_output_bounds_both_sides():
+    specs = model_specs({"model_name": "M24", "technical_specs": {"rated_output_max": "24 kW", "efficiency": ""}})
+    assert specs["output_kw_min"] == specs["output_kw_max"] == 24.0
+    assert specs["efficiency_pct"] is None
+
+
+def test_spec_filter_rejects_invalid_energy_class():
+    with pytest.raises(HTTPException) as e:
+        spec_filter(energy_class="A,Q")
+    assert e.value.status_code == 400
+
+
+def test_shape_facets_buckets():
+    result = {
+        "total": [{"count": 4}],
+        "categories": [{"_id": "combi", "count": 4}],
+        "energy_classes": [{"_id": "B", "count": 1}, {"_id": "A+", "count": 3}],
+        "output_kw": [{"_id": 20, "count": 2}, {"_id": 50, "count": 1}, {"_id": "other", "count": 1}],
+    }
+    facets = shape_facets(result)
+    assert facets["total"] == 4
+    assert facets["output_kw"] == [
+        {"min": 20, "max": 25, "count": 2},
+        {"min": 50, "max": 100, "count": 1},
+        {"min": None, "max": None, "count": 1},
+    ]
+    assert [f["value"] for f in facets["energy_classes"]] == ["A+", "B"]
+
+
+def test_shape_facets_empty():
+    assert shape_facets(None) == {"total": 0, "categories": [], "energy_classes": [], "output_kw": []}
+
+
+def test_facet_pipeline_counts_products_per_bucket():
+    cards = [
+        {"id": "p1", "category": "combi", "specs": [{"output_kw_max": 24.0}, {"output_kw_max": 24.5}]},
+        {"id": "p2", "category": "combi", "specs": [{"output_kw_max": 35.0}]},
+        {"id": "p3", "category": "combi", "specs": [{"output_kw_max": 2000.0}]},
+        {"id": "p4", "category": "boiler", "specs": [{"output_kw_max": 24.0}]},
+    ]
+
+    async def run():
+        db = AsyncMongoMockClient()["test"]
+        await db.product_cards.insert_many(cards)
+        return await db.product_cards.aggregate(facet_pipeline("combi", None)).to_list(length=1)
+
+    facets = shape_facets(asyncio.run(run())[0])
+    assert facets["total"] == 3
+    assert {f["value"]: f["count"] for f in facets["categories"]} == {"boiler": 1, "combi": 3}
+    # p1's two models share a bucket but count once
+    assert sorted(facets["output_kw"], key=lambda f: f["min"] or 0) == [
+        {"min": None, "max": None, "count": 1},
+        {"min": 20, "max": 25, "count": 1},
+        {"min": 35, "max": 50, "count": 1},
+    ]
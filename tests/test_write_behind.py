@@ -0,0 +1,99 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import NetworkTimeout
+
+from write_behind import WriteBehindQueue, _flock
+
+
+def _queue(tmp_path):
+    queue = WriteBehindQueue(AsyncMongoMockClient()["test"], tmp_path)
+    written = []
+
+    async def listener(docs):
+        written.extend(doc["id"] for doc in docs)
+
+    queue.subscribe("reviews", listener)
+    return queue, written
+
+
+class _FlakyDatabase:
+    """insert_many writes the first document, then times out; bulk_write fails ``bulk_failures`` times"""
+
+    def __init__(self, db, bulk_failures=0):
+        self.db = db
+        self.bulk_failures = bulk_failures
+
+    def __getitem__(self, name):
+        return _FlakyCollection(self, self.db[name])
+
+
+class _FlakyCollection:
+    def __init__(self, database, collection):
+        self.database = database
+        self.collection = collection
+
+    async def insert_many(self, docs, ordered=True):
+        await self.collection.insert_one(dict(docs[0]))
+        raise NetworkTimeout("timed out")
+
+    async def bulk_write(self, operations, ordered=True):
+        if self.database.bulk_failures:
+            self.database.bulk_failures -= 1
+            await self.collection.bulk_write(operations[:1], ordered=ordered)
+            raise NetworkTimeout("timed out")
+        return await self.collection.bulk_write(operations, ordered=ordered)
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+
+def _docs():
+    return [{"id": f"r{i}", "rating": 5} for i in range(3)]
+
+
+def test_partly_written_batch_is_replayed_and_announced_once(tmp_path):
+    queue, written = _queue(tmp_path)
+    queue.db = _FlakyDatabase(queue.db)
+
+    async def run():
+        for doc in _docs():
+            await queue.put("reviews", doc)
+        # r0 reached MongoDB before the timeout; the whole batch is journaled
+        await queue.flush()
+        assert written == [] and queue.journal.exists()
+        assert await queue.replay() == 3
+        return await queue.db["reviews"].count_documents({})
+
+    assert asyncio.run(run()) == 3
+    assert sorted(written) == ["r0", "r1", "r2"]
+    assert not queue.journal.exists() and not queue.replaying.exists()
+
+
+def test_retried_replay_announces_each_document_once(tmp_path):
+    queue, written = _queue(tmp_path)
+    queue.db = _FlakyDatabase(queue.db, bulk_failures=1)
+
+    async def run():
+        await queue._spill([("reviews", {**doc, "_id": f"oid-{doc['id']}"}) for doc in _docs()])
+        assert await queue.replay() == 0
+        assert written == [] and queue.replaying.exists()
+        assert await queue.replay() == 3
+        return await queue.db["reviews"].count_documents({})
+
+    assert asyncio.run(run()) == 3
+    assert sorted(written) == ["r0", "r1", "r2"]
+
+
+def test_replay_skips_while_another_process_replays(tmp_path):
+    queue, written = _queue(tmp_path)
+
+    async def run():
+        await queue._spill([("reviews", {"id": "r1", "_id": "oid1"})])
+        with _flock(queue.replay_lock):
+            assert await queue.replay() == 0
+        assert queue.journal.exists()
+        return await queue.replay()
+
+    assert asyncio.run(run()) == 1
+    assert written == ["r1"]